@@ -0,0 +1,130 @@
+import pygame
+from colors import *
+from objects import Ball, Paddle
+
+
+class Atlas:
+    """Pre-rendered sprite images packed into a few display format surfaces.
+
+    Blitting a surface whose pixel format differs from the display's
+    converts every pixel on every blit. The atlas draws every image once
+    into pages that were converted to the display format, and hands out
+    subsurfaces of them, so sprites blit straight from display format
+    memory. Images are placed side by side on shelves of the current page,
+    and a new page is started when it is full.
+
+    A display mode must be set before the atlas is created.
+
+    Args:
+        page_size ((int, int)): Size of each page.
+
+    Attributes:
+        pages (List[Surface]): The opaque pages.
+        alpha_pages (List[Surface]): The pages with per-pixel alpha.
+    """
+
+    # How to draw every kind of image, into a surface filled by it
+    DRAW = {"ball": Ball.draw, "paddle": Paddle.draw}
+    PADDING = 1
+
+    def __init__(self, page_size=(1024, 1024)):
+        self.page_size = page_size
+        self.pages = []
+        self.alpha_pages = []
+        self.images = {}
+        # The key every image was drawn for, to draw it at other scales
+        self._keys = {}
+        # Where the next image goes on the last page of each kind: the
+        # x and y of the current shelf and its height
+        self._cursors = {False: None, True: None}
+
+    def _new_page(self, alpha):
+        if alpha:
+            page = pygame.Surface(self.page_size, SRCALPHA).convert_alpha()
+            page.fill((0, 0, 0, 0))
+            self.alpha_pages.append(page)
+        else:
+            page = pygame.Surface(self.page_size).convert()
+            self.pages.append(page)
+        self._cursors[alpha] = [0, 0, 0]
+        return page
+
+    def _allocate(self, size, alpha):
+        width, height = size
+        padding = Atlas.PADDING
+        page_width, page_height = self.page_size
+        if width > page_width or height > page_height:
+            raise ValueError(f"an image of size {size} doesn't fit on a page")
+
+        pages = self.alpha_pages if alpha else self.pages
+        cursor = self._cursors[alpha]
+        if cursor is None:
+            page = self._new_page(alpha)
+            cursor = self._cursors[alpha]
+        else:
+            page = pages[-1]
+        x, y, shelf_height = cursor
+        if x + width > page_width:
+            # Start a new shelf below the current one
+            x, y, shelf_height = 0, y + shelf_height + padding, 0
+        if y + height > page_height:
+            page = self._new_page(alpha)
+            cursor = self._cursors[alpha]
+            x, y, shelf_height = 0, 0, 0
+        cursor[:] = x + width + padding, y, max(shelf_height, height)
+        return page.subsurface(pygame.Rect((x, y), size))
+
+    def image(self, name, size, color=WHITE, scale=1, alpha=False):
+        """Return an image, drawing it into the atlas the first time.
+
+        Args:
+            name (str): The kind of image, one of `DRAW`.
+            size ((int, int)): Unscaled width and height.
+            color (Color or (int, int, int))
+            scale (int or float): Factor the image is drawn larger by,
+                for rendering at higher resolutions.
+            alpha (bool): Whether the image has per-pixel transparency.
+
+        Returns:
+            Surface: A subsurface of one of the pages. It is shared and
+            must not be drawn on.
+        """
+        key = (name, tuple(size), tuple(color), scale, alpha)
+        image = self.images.get(key)
+        if image is None:
+            scaled = (round(size[0] * scale), round(size[1] * scale))
+            image = self._allocate(scaled, alpha)
+            Atlas.DRAW[name](image, color)
+            self.images[key] = image
+            self._keys[image] = key
+        return image
+
+    def scaled(self, image, scale):
+        """Return an image of the atlas drawn at another scale.
+
+        Args:
+            image (Surface): An image returned by `image`.
+            scale (int or float)
+
+        Returns:
+            Surface: The same kind of image drawn at `scale`, or None if
+            `image` isn't from the atlas.
+        """
+        key = self._keys.get(image)
+        if key is None:
+            return None
+        name, size, color, _, alpha = key
+        return self.image(name, size, color, scale, alpha)
+
+    def prerender(self, sizes, colors, scales=(1,)):
+        """Draw every combination of images, colors and scales up front.
+
+        Args:
+            sizes (Dict[str, (int, int)]): The size of every kind of image.
+            colors (Iterable[Color or (int, int, int)])
+            scales (Iterable[int or float])
+        """
+        for color in colors:
+            for scale in scales:
+                for name, size in sizes.items():
+                    self.image(name, size, color, scale)
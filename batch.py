@@ -0,0 +1,272 @@
+import math
+import numpy as np
+from objects import Ball, Paddle
+
+
+# What a ball runs into first during a step, see `Ball.next_impact`
+FREE, WALL, LEFT_GOAL, RIGHT_GOAL, LEFT_PADDLE, RIGHT_PADDLE = range(6)
+
+
+class BatchPhysics:
+    """Steps many independent matches at once using NumPy arrays.
+
+    Every match follows the rules of a single `Game` with a `Ball` and a
+    left and right `Paddle`: the ball bounces off the top and bottom
+    walls, changes angle depending on where it hits a paddle, speeds up
+    on every hit and is reset to the center at a random angle when a
+    player scores.
+
+    Positions are floats, paddle moves are rounded down to multiples of
+    1 / `Paddle.SUBPIXELS` and the ball's path during a step is swept
+    for the earliest impact, the way `Paddle.update` and `Ball.update`
+    work, so a match given the same launch angles plays out exactly as a
+    headless `Game` does.
+
+    Args:
+        n (int): Number of concurrent matches.
+        size ((int, int)): Width and height of the playing field.
+        speed (int or float): The initial speed of the balls.
+        maxspeed (int or float): The speed the balls can not exceed.
+        paddle_speed (int or float): Maximum distance a paddle moves per step.
+        seed (int): Seed for the random launch angles.
+
+    Attributes:
+        ball_x, ball_y (ndarray): Top left corner of each ball.
+        speed (ndarray): The current speed of each ball.
+        angle (ndarray): The angle at which each ball is moving, in radians.
+        velocity_x, velocity_y (ndarray): Distance each ball moves per
+            step, see `new_trajectory`.
+        hits (ndarray): How many times each ball has hit a paddle.
+        left_y, right_y (ndarray): Top of each left and right paddle.
+        player1_score, player2_score (ndarray): The score of each match.
+        player1_scored, player2_scored (ndarray): Which matches a player
+            scored in during the last step.
+    """
+
+    def __init__(self, n, size, speed, maxspeed, paddle_speed=5, seed=None):
+        self.n = n
+        self.width, self.height = size
+        self.initial_speed = speed
+        self.maxspeed = maxspeed
+        self.paddle_speed = paddle_speed
+        self.rng = np.random.default_rng(seed)
+
+        self.ball_x = np.empty(n, dtype=np.float64)
+        self.ball_y = np.empty(n, dtype=np.float64)
+        self.speed = np.empty(n, dtype=np.float64)
+        self.angle = np.empty(n, dtype=np.float64)
+        self.velocity_x = np.empty(n, dtype=np.float64)
+        self.velocity_y = np.empty(n, dtype=np.float64)
+        self.hits = np.zeros(n, dtype=np.int64)
+        self.left_y = np.empty(n, dtype=np.float64)
+        self.right_y = np.empty(n, dtype=np.float64)
+        self.player1_score = np.zeros(n, dtype=np.int64)
+        self.player2_score = np.zeros(n, dtype=np.int64)
+        self.player1_scored = np.zeros(n, dtype=bool)
+        self.player2_scored = np.zeros(n, dtype=bool)
+
+        # Paddles only move vertically, so their x never changes
+        self.left_x = 0
+        self.right_x = self.width - Paddle.WIDTH
+        self.reset()
+
+    def _random_angle(self, k):
+        """Return k random angles (in radians) between 0.15π and 0.3π."""
+        return math.pi * self.rng.uniform(0.15, 0.3, size=k)
+
+    def reset(self):
+        """Reset every match to its initial state, including the scores."""
+        everything = np.ones(self.n, dtype=bool)
+        self.reinit_balls(everything)
+        self.hits.fill(0)
+        self.left_y.fill(self.height // 2 - Paddle.HEIGHT / 2)
+        self.right_y.fill(self.height // 2 - Paddle.HEIGHT / 2)
+        self.player1_score.fill(0)
+        self.player2_score.fill(0)
+
+    def reinit_balls(self, mask):
+        """Reset the selected balls to the center at initial speed and a random angle.
+
+        Args:
+            mask (ndarray): Boolean array selecting the matches to reset.
+        """
+        k = np.count_nonzero(mask)
+        if k == 0:
+            return
+        self.angle[mask] = self._random_angle(k)
+        self.ball_x[mask] = self.width // 2 - Ball.WIDTH / 2
+        self.ball_y[mask] = self.height // 2 - Ball.HEIGHT / 2
+        self.speed[mask] = self.initial_speed
+        self.new_trajectory(mask)
+
+    def new_trajectory(self, mask):
+        """Work out the velocity of the selected balls from their angle and speed.
+
+        Must be called after changing `angle` or `speed` from outside.
+
+        Args:
+            mask (ndarray): Boolean array or indices selecting the matches.
+        """
+        speed = self.speed[mask]
+        angle = self.angle[mask]
+        self.velocity_x[mask] = speed * np.cos(angle)
+        self.velocity_y[mask] = -(speed * np.sin(angle))
+
+    def basic_moves(self, paddle_y):
+        """Return the moves of the "basic" AI, which follows the ball.
+
+        Args:
+            paddle_y (ndarray): Top of the paddles being controlled.
+
+        Returns:
+            ndarray: How far each paddle should move this step, before
+            `step` rounds it down like `Paddle.moveup` does.
+        """
+        target = self.ball_y + Ball.HEIGHT / 2
+        difference = target - (paddle_y + Paddle.HEIGHT / 2)
+        return np.clip(difference, -self.paddle_speed, self.paddle_speed)
+
+    def _move_paddles(self, paddle_y, moves):
+        # Moves are rounded down to whole subpixels, as in `Paddle.moveup`
+        # and `Paddle.movedown`
+        amount = np.minimum(np.abs(moves), self.paddle_speed)
+        amount = np.floor(amount * Paddle.SUBPIXELS) / Paddle.SUBPIXELS
+        newpos = paddle_y + np.sign(moves) * amount
+        inside = (newpos >= 0) & (newpos + Paddle.HEIGHT <= self.height)
+        np.copyto(paddle_y, newpos, where=inside)
+
+    def _time_of_impact(self, x, y, vx, vy, paddle_x, paddle_y):
+        """Vectorised `Ball.time_of_impact`, with NaN where the ball doesn't hit."""
+        left = paddle_x - Ball.WIDTH
+        right = paddle_x + Paddle.WIDTH
+        top = paddle_y - Ball.HEIGHT
+        bottom = paddle_y + Paddle.HEIGHT
+
+        moving_x = vx != 0
+        enter_x = np.where(moving_x, (left - x) / vx, -np.inf)
+        exit_x = np.where(moving_x, (right - x) / vx, np.inf)
+        enter_x, exit_x = np.minimum(enter_x, exit_x), np.maximum(enter_x, exit_x)
+        moving_y = vy != 0
+        enter_y = np.where(moving_y, (top - y) / vy, -np.inf)
+        exit_y = np.where(moving_y, (bottom - y) / vy, np.inf)
+        enter_y, exit_y = np.minimum(enter_y, exit_y), np.maximum(enter_y, exit_y)
+
+        enter = np.maximum(enter_x, enter_y)
+        leave = np.minimum(exit_x, exit_y)
+        miss = (enter >= leave) | (leave <= 0)
+        miss |= ~moving_x & ~((left < x) & (x < right))
+        miss |= ~moving_y & ~((top < y) & (y < bottom))
+        return np.where(miss, np.nan, np.maximum(enter, 0))
+
+    def _next_impact(self, i, x, y, vx, vy, remaining):
+        """Vectorised `Ball.next_impact` for the matches `i`.
+
+        Returns:
+            (ndarray, ndarray): The time of impact and what was hit, one
+            of `FREE`, `WALL`, `LEFT_GOAL`, `RIGHT_GOAL`, `LEFT_PADDLE`
+            or `RIGHT_PADDLE`.
+        """
+        first_time = remaining.copy()
+        first = np.full(len(i), FREE)
+        moving_left = vx < 0
+
+        time = np.where(
+            vy < 0,
+            -y / vy,
+            np.where(vy > 0, (self.height - Ball.HEIGHT - y) / vy, np.inf),
+        )
+        wall = time <= first_time
+        first_time[wall] = np.maximum(time[wall], 0)
+        first[wall] = WALL
+
+        time = np.where(
+            moving_left,
+            -x / vx,
+            np.where(vx > 0, (self.width - Ball.WIDTH - x) / vx, np.inf),
+        )
+        goal = time <= first_time
+        first_time[goal] = np.maximum(time[goal], 0)
+        first[goal] = np.where(moving_left, LEFT_GOAL, RIGHT_GOAL)[goal]
+
+        # Only the paddle the ball moves towards can be hit
+        time = self._time_of_impact(
+            x,
+            y,
+            vx,
+            vy,
+            np.where(moving_left, self.left_x, self.right_x),
+            np.where(moving_left, self.left_y[i], self.right_y[i]),
+        )
+        paddle = time < first_time
+        first_time[paddle] = time[paddle]
+        first[paddle] = np.where(moving_left, LEFT_PADDLE, RIGHT_PADDLE)[paddle]
+        return first_time, first
+
+    def _hit_paddle(self, i, y, paddle_y, base, slope):
+        self.hits[i] += 1
+        speed_up = i[self.speed[i] < self.maxspeed]
+        self.speed[speed_up] += 1
+        collision_location = (y + Ball.HEIGHT / 2 - paddle_y[i]) / Paddle.HEIGHT
+        self.angle[i] = (collision_location * slope + base) * math.pi
+        self.new_trajectory(i)
+
+    def step(self, right_moves, left_moves):
+        """Advance every match by one tick.
+
+        Args:
+            right_moves (ndarray or number): How far each right paddle moves.
+            left_moves (ndarray or number): How far each left paddle moves.
+        """
+        self._move_paddles(self.right_y, right_moves)
+        self._move_paddles(self.left_y, left_moves)
+        self.player1_scored.fill(False)
+        self.player2_scored.fill(False)
+
+        # The matches whose ball is still travelling this step
+        i = np.arange(self.n)
+        x = self.ball_x.copy()
+        y = self.ball_y.copy()
+        remaining = np.ones(self.n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for _ in range(Ball.MAX_BOUNCES):
+                vx = self.velocity_x[i]
+                vy = self.velocity_y[i]
+                time, impact = self._next_impact(i, x, y, vx, vy, remaining)
+
+                free = impact == FREE
+                self.ball_x[i[free]] = x[free] + vx[free] * remaining[free]
+                self.ball_y[i[free]] = y[free] + vy[free] * remaining[free]
+
+                hit = ~free
+                i, impact = i[hit], impact[hit]
+                x = x[hit] + vx[hit] * time[hit]
+                y = y[hit] + vy[hit] * time[hit]
+                remaining = remaining[hit] - time[hit]
+                self.ball_x[i] = x
+                self.ball_y[i] = y
+
+                wall = i[impact == WALL]
+                self.angle[wall] = -self.angle[wall]
+                self.new_trajectory(wall)
+                left = impact == LEFT_PADDLE
+                self._hit_paddle(i[left], y[left], self.left_y, 0.25, -0.5)
+                right = impact == RIGHT_PADDLE
+                self._hit_paddle(i[right], y[right], self.right_y, 0.75, 0.5)
+
+                self.player1_scored[i[impact == LEFT_GOAL]] = True
+                self.player2_scored[i[impact == RIGHT_GOAL]] = True
+                goal = (impact == LEFT_GOAL) | (impact == RIGHT_GOAL)
+                scored = np.zeros(self.n, dtype=bool)
+                scored[i[goal]] = True
+                self.reinit_balls(scored)
+
+                # Scoring ends the ball's step
+                travelling = ~goal
+                i, x, y = i[travelling], x[travelling], y[travelling]
+                remaining = remaining[travelling]
+                if not len(i):
+                    break
+            # If a ball bounced MAX_BOUNCES times it stays at the last impact
+
+        self.player1_score += self.player1_scored
+        self.player2_score += self.player2_scored
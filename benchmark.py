@@ -0,0 +1,140 @@
+"""
+Throughput benchmarks for the physics, the AI controllers and rendering.
+
+Every benchmark is run a few times and the best result is kept, which is
+the least noisy estimate of what the code can do. Results are printed as
+JSON and compared with a stored baseline; the script exits with status 1
+if any result dropped by more than the threshold.
+
+Usage: python benchmark.py [--baseline FILE] [--threshold 0.2] [--save]
+"""
+
+import os
+
+# Rendering is benchmarked offscreen
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import argparse
+import json
+import sys
+from time import perf_counter
+from main import setup_game
+from movement_managers import PaddleMovementManager_Action
+from profiler import FrameProfiler
+
+
+FORMAT_VERSION = 1
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+
+def physics_ticks_per_second(ticks=50000):
+    """Headless simulation steps per second with paddles standing still."""
+    game = setup_game(
+        True, PaddleMovementManager_Action, PaddleMovementManager_Action, seed=0
+    )
+    start = perf_counter()
+    game.run_headless(max_ticks=ticks)
+    return ticks / (perf_counter() - start)
+
+
+def ai_decisions_per_second(type, ticks=50000):
+    """Decisions per second of an AI controlling both paddles.
+
+    Only the time spent in the movement managers is counted.
+    """
+    profiler = FrameProfiler()
+    game = setup_game(True, type, type, seed=0, profiler=profiler)
+    game.run_headless(max_ticks=ticks)
+    return 2 * ticks / profiler.phase_totals["movement_managers"]
+
+
+def render_frames_per_second(frames=2000):
+    """Frames per second of simulating and rendering to the dummy display."""
+    game = setup_game(seed=0, fps=None)
+    game.initial_frame()
+    start = perf_counter()
+    for _ in range(frames):
+        game.step()
+        game.render()
+    return frames / (perf_counter() - start)
+
+
+BENCHMARKS = {
+    "physics_ticks_per_second": physics_ticks_per_second,
+    "ai_decisions_per_second.basic": lambda: ai_decisions_per_second("basic"),
+    "ai_decisions_per_second.advanced": lambda: ai_decisions_per_second("advanced"),
+    "ai_decisions_per_second.search": lambda: ai_decisions_per_second("search"),
+    "render_frames_per_second": render_frames_per_second,
+}
+
+
+def run(repeat=3):
+    """Run every benchmark `repeat` times.
+
+    Returns:
+        Dict[str, float]: The best result of each benchmark.
+    """
+    return {
+        name: max(benchmark() for _ in range(repeat))
+        for name, benchmark in BENCHMARKS.items()
+    }
+
+
+def compare(results, baseline, threshold):
+    """List the benchmarks that got slower than the baseline allows.
+
+    Args:
+        results (Dict[str, float])
+        baseline (Dict[str, float])
+        threshold (float): Allowed relative drop, e.g. 0.2 for 20%.
+
+    Returns:
+        List[str]: A description of every regression.
+    """
+    regressions = []
+    for name, expected in sorted(baseline.items()):
+        actual = results.get(name)
+        if actual is not None and actual < expected * (1 - threshold):
+            regressions.append(
+                f"{name}: {actual:.0f}/s is {1 - actual / expected:.0%} below {expected:.0f}/s"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed drop")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark")
+    parser.add_argument("--save", action="store_true", help="store as new baseline")
+    args = parser.parse_args()
+
+    report = {"version": FORMAT_VERSION, "results": run(args.repeat)}
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+    if args.save:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+            file.write("\n")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save to create one")
+        return
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if baseline.get("version") != FORMAT_VERSION:
+        sys.exit(f"{args.baseline} has an incompatible format version")
+
+    for name in sorted(set(report["results"]) - set(baseline["results"])):
+        print(f"no baseline for {name}, it isn't compared", file=sys.stderr)
+    regressions = compare(report["results"], baseline["results"], args.threshold)
+    for regression in regressions:
+        print("REGRESSION", regression, file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
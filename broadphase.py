@@ -0,0 +1,143 @@
+import math
+
+
+class UniformGrid:
+    """A uniform grid of cells that tracks which sprites overlap which cells.
+
+    Looking up the sprites near a rect only visits the cells the rect
+    overlaps, instead of testing every sprite. Sprites must call `move`
+    after they change position; it only touches the grid when the sprite
+    crossed into other cells.
+
+    Args:
+        area (Rect): The area covered by the grid. Sprites outside of it
+            are stored in the border cells.
+        cell_size (int): Width and height of a cell.
+
+    Attributes:
+        columns (int)
+        rows (int)
+    """
+
+    def __init__(self, area, cell_size=64):
+        self.area = area
+        self.cell_size = cell_size
+        self.columns = max(1, math.ceil(area.width / cell_size))
+        self.rows = max(1, math.ceil(area.height / cell_size))
+        self.cells = [[] for _ in range(self.columns * self.rows)]
+        self.ranges = {}
+        self.order = {}
+        self._inserted = 0
+
+    def _range(self, rect):
+        size = self.cell_size
+        last_column = self.columns - 1
+        last_row = self.rows - 1
+        left = min(max((rect.left - self.area.left) // size, 0), last_column)
+        right = min(max((rect.right - 1 - self.area.left) // size, 0), last_column)
+        top = min(max((rect.top - self.area.top) // size, 0), last_row)
+        bottom = min(max((rect.bottom - 1 - self.area.top) // size, 0), last_row)
+        return left, top, right, bottom
+
+    def _cells(self, cell_range):
+        left, top, right, bottom = cell_range
+        cells = self.cells
+        columns = self.columns
+        for row in range(top, bottom + 1):
+            for column in range(left, right + 1):
+                yield cells[row * columns + column]
+
+    def insert(self, sprite):
+        """Start tracking a sprite."""
+        cell_range = self._range(sprite.rect)
+        self.ranges[sprite] = cell_range
+        self.order[sprite] = self._inserted
+        self._inserted += 1
+        for cell in self._cells(cell_range):
+            cell.append(sprite)
+
+    def remove(self, sprite):
+        """Stop tracking a sprite."""
+        for cell in self._cells(self.ranges.pop(sprite)):
+            cell.remove(sprite)
+        del self.order[sprite]
+
+    def move(self, sprite):
+        """Update the cells of a sprite after it moved."""
+        cell_range = self._range(sprite.rect)
+        old_range = self.ranges[sprite]
+        if cell_range == old_range:
+            return
+        for cell in self._cells(old_range):
+            cell.remove(sprite)
+        for cell in self._cells(cell_range):
+            cell.append(sprite)
+        self.ranges[sprite] = cell_range
+
+    def query(self, rect):
+        """Return the sprites in the cells `rect` overlaps.
+
+        These are candidates that may collide with `rect`; an exact test
+        is still needed. They are returned in the order they were
+        inserted, so results don't depend on hashing.
+
+        Returns:
+            List[Sprite]
+        """
+        cell_range = self._range(rect)
+        left, top, right, bottom = cell_range
+        if left == right and top == bottom:
+            return list(self.cells[top * self.columns + left])
+        found = set()
+        for cell in self._cells(cell_range):
+            found.update(cell)
+        return sorted(found, key=self.order.__getitem__)
+
+    def column(self, column):
+        """Return the sprites overlapping a column of cells, in insertion order."""
+        found = set()
+        for row in range(self.rows):
+            found.update(self.cells[row * self.columns + column])
+        return sorted(found, key=self.order.__getitem__)
+
+
+def threat_ball(grid, paddle):
+    """Find the ball a paddle should go for.
+
+    The columns of the grid are scanned starting at the paddle's side of
+    the field. In the first column holding a ball that moves towards the
+    paddle, the ball that will reach the paddle soonest is picked. If no
+    ball is approaching the nearest ball is returned.
+
+    Args:
+        grid (UniformGrid): The grid the balls are tracked in.
+        paddle (Paddle)
+
+    Returns:
+        Ball: The threat, or None if there are no balls.
+    """
+    if paddle.side == "left":
+        columns = range(grid.columns)
+        x = paddle.body.x + paddle.body.width
+    else:
+        columns = range(grid.columns - 1, -1, -1)
+        x = paddle.body.x
+
+    nearest = None
+    for column in columns:
+        best = None
+        best_time = math.inf
+        for ball in grid.column(column):
+            if nearest is None:
+                nearest = ball
+            velocity_x = ball.velocity[0]
+            distance = x - ball.body.centerx
+            # Approaching balls move in the direction of the paddle
+            if velocity_x * distance > 0:
+                time = distance / velocity_x
+                if time < best_time:
+                    best = ball
+                    best_time = time
+        if best is not None:
+            return best
+    return nearest
@@ -5,3 +5,11 @@ GREEN = (0, 255, 0)
 BLUE = (0, 0, 255)
 
 DARKGRAY = (30, 30, 30)
+
+# Color of the sprites and of the field for every theme
+THEMES = {
+    "classic": (WHITE, DARKGRAY),
+    "red": (RED, BLACK),
+    "green": (GREEN, BLACK),
+    "blue": (BLUE, BLACK),
+}
@@ -0,0 +1,167 @@
+"""
+Registry of paddle controllers.
+
+A controller is a function that takes a `Paddle` and returns the
+`PaddleMovementManager` that moves it. Controllers are registered by
+name as a "module:attribute" path and only imported when a game first
+asks for them, so a worker only loads the controllers it plays with.
+
+Other packages can add controllers without touching this file by
+declaring an entry point in the "pong.controllers" group, e.g. in their
+pyproject.toml:
+
+    [project.entry-points."pong.controllers"]
+    mybot = "mybot.controller:make"
+"""
+
+import importlib
+from importlib import metadata
+
+
+ENTRY_POINT_GROUP = "pong.controllers"
+
+REGISTRY = {
+    "basic": "controllers:basic",
+    "advanced": "controllers:advanced",
+    "search": "movement_managers:PaddleMovementManager_Search",
+    "idle": "controllers:idle",
+    "keyboard": "controllers:keyboard",
+    "keyboard-ws": "controllers:keyboard_ws",
+    "gamepad": "controllers:gamepad",
+    "gamepad-2": "controllers:gamepad_2",
+}
+
+_loaded = {}
+_entry_points_loaded = False
+
+
+def register(name, controller):
+    """Make a controller available under `name`.
+
+    Args:
+        name (str)
+        controller (str or Callable[[Paddle], PaddleMovementManager]):
+            A "module:attribute" path to the controller, or the
+            controller itself.
+    """
+    REGISTRY[name] = controller
+    _loaded.pop(name, None)
+
+
+def _load_entry_points():
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    for entry_point in metadata.entry_points(group=ENTRY_POINT_GROUP):
+        # Controllers registered in code take precedence
+        REGISTRY.setdefault(entry_point.name, entry_point.value)
+
+
+def names():
+    """Return the names of every known controller, including entry points."""
+    _load_entry_points()
+    return sorted(REGISTRY)
+
+
+def import_path(path):
+    """Import the object a "module:attribute" path points to."""
+    module_name, _, attribute = path.partition(":")
+    if not attribute:
+        raise ValueError(f"{path!r} is not a 'module:attribute' path")
+    target = importlib.import_module(module_name)
+    for part in attribute.split("."):
+        target = getattr(target, part)
+    return target
+
+
+def get(name):
+    """Return the controller registered as `name`, importing it if needed.
+
+    Entry points are only looked up if `name` isn't registered in code.
+    A "module:attribute" path can also be used directly as the name.
+
+    Args:
+        name (str)
+
+    Returns:
+        Callable[[Paddle], PaddleMovementManager]
+
+    Raises:
+        ValueError: If there is no such controller.
+    """
+    controller = _loaded.get(name)
+    if controller is not None:
+        return controller
+
+    if name not in REGISTRY:
+        _load_entry_points()
+    target = REGISTRY.get(name)
+    if target is None:
+        if ":" not in name:
+            raise ValueError(
+                f"unknown controller {name!r}, choose from {', '.join(names())}"
+            )
+        target = name
+    controller = import_path(target) if isinstance(target, str) else target
+    _loaded[name] = controller
+    return controller
+
+
+def _ai_rng(paddle):
+    return paddle.game.make_rng(f"ai-{paddle.side}-{paddle.inset}")
+
+
+# The controllers below import what they need when they are called, so
+# importing this module to look one up doesn't load the rest
+
+
+def basic(paddle):
+    """An AI that follows the ball."""
+    from movement_managers import PaddleMovementManager_AI
+
+    return PaddleMovementManager_AI(paddle, "basic", _ai_rng(paddle))
+
+
+def advanced(paddle):
+    """An AI that moves to where the ball will cross its side."""
+    from movement_managers import PaddleMovementManager_AI
+
+    return PaddleMovementManager_AI(paddle, "advanced", _ai_rng(paddle))
+
+
+def idle(paddle):
+    """A paddle that stands still."""
+    from movement_managers import PaddleMovementManager_Action
+
+    return PaddleMovementManager_Action(paddle)
+
+
+def keyboard(paddle):
+    """A human player using the up and down arrow keys."""
+    from movement_managers import PaddleMovementManager_Manual
+    from pygame.locals import K_DOWN, K_UP
+
+    return PaddleMovementManager_Manual(paddle, K_UP, K_DOWN)
+
+
+def keyboard_ws(paddle):
+    """A human player using the W and S keys."""
+    from movement_managers import PaddleMovementManager_Manual
+    from pygame.locals import K_s, K_w
+
+    return PaddleMovementManager_Manual(paddle, K_w, K_s)
+
+
+def gamepad(paddle):
+    """A human player using the left stick of the first gamepad."""
+    from movement_managers import PaddleMovementManager_Joystick
+
+    return PaddleMovementManager_Joystick(paddle, 0)
+
+
+def gamepad_2(paddle):
+    """A human player using the left stick of the second gamepad."""
+    from movement_managers import PaddleMovementManager_Joystick
+
+    return PaddleMovementManager_Joystick(paddle, 1)
@@ -0,0 +1,197 @@
+import pygame
+from collections import deque
+from time import perf_counter
+from pygame.locals import *
+
+
+class InputDispatcher:
+    """Routes input events to whoever is interested in them.
+
+    Handlers subscribe to an event type and a code: the key of keyboard
+    events, the (joystick, button), (joystick, axis) or (joystick, hat)
+    of joystick events, or None for events without one such as QUIT.
+    Every event is routed with a single dictionary lookup instead of
+    being offered to everyone.
+
+    Keys and joystick buttons can also be watched. Each watched control
+    gets a bit in `buttons`, which is kept up to date from the events, so
+    movement managers read the state of all their controls with a mask
+    once per tick. Joystick axes are kept in `axes`.
+
+    Joysticks are numbered in the order they were connected.
+
+    Args:
+        window (int): Number of recent input latencies kept.
+
+    Attributes:
+        buttons (int): Bitset of the watched controls that are held down.
+        axes (Dict[(int, int), float]): Position of every joystick axis
+            that has moved, keyed by (joystick, axis).
+        hats (Dict[(int, int), (int, int)]): Position of every joystick
+            hat that has moved, keyed by (joystick, hat).
+        joysticks (List[Joystick]): The joysticks by number, None for
+            ones that were disconnected.
+        latencies (deque): Seconds from the most recent inputs being
+            dispatched to the frame showing their effect being displayed.
+            The time events wait in pygame's queue until the game loop
+            gets them, at most a frame, is not included.
+    """
+
+    # The attribute of each type of event that handlers subscribe to
+    CODES = {
+        KEYDOWN: "key",
+        KEYUP: "key",
+        JOYBUTTONDOWN: "button",
+        JOYBUTTONUP: "button",
+        JOYAXISMOTION: "axis",
+        JOYHATMOTION: "hat",
+    }
+    PRESSES = (KEYDOWN, JOYBUTTONDOWN)
+    RELEASES = {KEYUP: KEYDOWN, JOYBUTTONUP: JOYBUTTONDOWN}
+
+    def __init__(self, window=600):
+        self.handlers = {}
+        self.masks = {}
+        self.buttons = 0
+        self.axes = {}
+        self.hats = {}
+        self.joysticks = []
+        self.numbers = {}
+        self.latencies = deque(maxlen=window)
+        self._input_time = None
+        self._stepped_time = None
+
+    def subscribe(self, type, code, handler):
+        """Call `handler` with every event of `type` with `code`.
+
+        Args:
+            type (int): The event type, e.g. KEYDOWN.
+            code: The key, (joystick, button), (joystick, axis) or
+                (joystick, hat) the event is about, or None.
+            handler (Callable[[Event], None])
+        """
+        self.handlers.setdefault((type, code), []).append(handler)
+
+    def unsubscribe(self, type, code, handler):
+        """Stop calling `handler` for events of `type` with `code`."""
+        handlers = self.handlers.get((type, code))
+        if handlers is not None and handler in handlers:
+            handlers.remove(handler)
+            if not handlers:
+                del self.handlers[(type, code)]
+
+    def _watch(self, control):
+        mask = self.masks.get(control)
+        if mask is None:
+            mask = self.masks[control] = 1 << len(self.masks)
+        return mask
+
+    def watch_key(self, key):
+        """Start tracking whether `key` is held down.
+
+        The key may already be down, so its state is polled once.
+
+        Returns:
+            int: The bit of the key in `buttons`.
+        """
+        mask = self._watch((KEYDOWN, key))
+        if pygame.display.get_init() and pygame.key.get_pressed()[key]:
+            self.buttons |= mask
+        return mask
+
+    def watch_button(self, joystick, button):
+        """Start tracking whether a joystick button is held down.
+
+        Returns:
+            int: The bit of the button in `buttons`.
+        """
+        return self._watch((JOYBUTTONDOWN, (joystick, button)))
+
+    def axis(self, joystick, axis):
+        """Return the position of a joystick axis, 0 if it hasn't moved."""
+        return self.axes.get((joystick, axis), 0)
+
+    def dispatch(self, event):
+        """Route an event to its handlers and update the tracked state."""
+        type = event.type
+        if type == JOYDEVICEADDED:
+            self._add_joystick(event.device_index)
+        elif type == JOYDEVICEREMOVED:
+            self._remove_joystick(event.instance_id)
+        elif type == WINDOWFOCUSLOST:
+            # Keys released while the window isn't focused send no event
+            self.buttons = 0
+
+        attribute = InputDispatcher.CODES.get(type)
+        if attribute is None:
+            code = None
+        elif type == KEYDOWN or type == KEYUP:
+            code = getattr(event, attribute)
+        else:
+            code = (self.numbers.get(event.instance_id), getattr(event, attribute))
+            if type == JOYAXISMOTION:
+                self.axes[code] = event.value
+                self._input()
+            elif type == JOYHATMOTION:
+                self.hats[code] = event.value
+                self._input()
+
+        if type in InputDispatcher.PRESSES:
+            mask = self.masks.get((type, code))
+            if mask is not None:
+                self.buttons |= mask
+                self._input()
+        else:
+            press = InputDispatcher.RELEASES.get(type)
+            if press is not None:
+                mask = self.masks.get((press, code))
+                if mask is not None:
+                    self.buttons &= ~mask
+                    self._input()
+
+        handlers = self.handlers.get((type, code))
+        if handlers is not None:
+            self._input()
+            for handler in handlers:
+                handler(event)
+
+    def _add_joystick(self, device_index):
+        joystick = pygame.joystick.Joystick(device_index)
+        if joystick.get_instance_id() in self.numbers:
+            return
+        self.numbers[joystick.get_instance_id()] = len(self.joysticks)
+        self.joysticks.append(joystick)
+
+    def _remove_joystick(self, instance_id):
+        number = self.numbers.pop(instance_id, None)
+        if number is None:
+            return
+        # Numbers stay the same so the remaining players keep their controls
+        self.joysticks[number] = None
+        for key in [key for key in self.axes if key[0] == number]:
+            del self.axes[key]
+
+    def _input(self):
+        if self._input_time is None:
+            self._input_time = perf_counter()
+
+    def stepped(self):
+        """Note that a step has applied the inputs dispatched so far."""
+        if self._input_time is not None:
+            if self._stepped_time is None:
+                self._stepped_time = self._input_time
+            self._input_time = None
+
+    def presented(self):
+        """Note that a frame was displayed.
+
+        Returns:
+            float: The latency in seconds of the inputs the frame shows
+            the effect of, or None if it shows no new input.
+        """
+        if self._stepped_time is None:
+            return None
+        latency = perf_counter() - self._stepped_time
+        self._stepped_time = None
+        self.latencies.append(latency)
+        return latency
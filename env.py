@@ -0,0 +1,196 @@
+import math
+from array import array
+from main import setup_game
+from movement_managers import PaddleMovementManager_Action
+
+
+class PongEnv:
+    """A Gym-style environment where an agent controls one paddle.
+
+    The match runs headlessly against one of the `PaddleMovementManager_AI`
+    opponents. An episode ends when either player reaches `max_score` or
+    after `max_steps` steps.
+
+    To keep the cost per step low the observation is a preallocated
+    array that is overwritten in place, so copy it if it needs to be kept
+    across steps.
+
+    Args:
+        side (str): "left" or "right", the paddle controlled by the agent.
+        opponent (str): "basic" or "advanced"
+        max_score (int): Score that ends an episode.
+        max_steps (int): Number of steps after which an episode is cut off.
+        seed (int): Seed of the game's random number generators.
+
+    Attributes:
+        game (Game): The headless game being stepped.
+        observation (array): Ball center x and y, ball velocity x and y,
+            agent paddle center y and opponent paddle center y, scaled to
+            roughly [-1, 1].
+        info (dict): Scores of the current episode, updated in place.
+    """
+
+    ACTIONS = (0, -1, 1)  # still, up, down
+    OBSERVATION_SIZE = 6
+
+    def __init__(
+        self, side="right", opponent="basic", max_score=1, max_steps=10000, seed=None
+    ):
+        self.side = side
+        self.max_score = max_score
+        self.max_steps = max_steps
+        if side == "right":
+            self.game = setup_game(
+                True, PaddleMovementManager_Action, opponent, seed=seed
+            )
+        else:
+            self.game = setup_game(
+                True, opponent, PaddleMovementManager_Action, seed=seed
+            )
+        agent_index = 0 if side == "right" else 1
+        self.agent = self.game.movement_managers[agent_index]
+        self.opponent = self.game.movement_managers[1 - agent_index]
+        self.ball = self.game.spritegroups["ballsprite"].sprite
+        self.observation = array("d", bytes(8 * PongEnv.OBSERVATION_SIZE))
+        self.info = {"player1_score": 0, "player2_score": 0}
+        self._score = 0
+        self._opponent_score = 0
+
+    def _scores(self):
+        state = self.game.state
+        if self.side == "right":
+            return state.player1_score, state.player2_score
+        return state.player2_score, state.player1_score
+
+    def observe(self, out, start=0):
+        """Write the current observation into `out` starting at index `start`."""
+        width, height = self.game.area.size
+        ball = self.ball
+        velocity = ball.speed / ball.maxspeed
+        out[start] = ball.body.centerx / width
+        out[start + 1] = ball.body.centery / height
+        out[start + 2] = velocity * math.cos(ball.angle)
+        out[start + 3] = -velocity * math.sin(ball.angle)
+        out[start + 4] = self.agent.paddle.body.centery / height
+        out[start + 5] = self.opponent.paddle.body.centery / height
+
+    def reset(self):
+        """Start a new episode.
+
+        Returns:
+            array: The first observation of the episode.
+        """
+        game = self.game
+        game.state.reset_scores()
+        game.ticks = 0
+        self.ball.reinit()
+        for movement_manager in game.movement_managers:
+            movement_manager.paddle.reinit()
+        self.agent.direction = 0
+        self.opponent.target_y = None
+        self.opponent.offset = 0
+        self._score = 0
+        self._opponent_score = 0
+        self.info["player1_score"] = 0
+        self.info["player2_score"] = 0
+        self.observe(self.observation)
+        return self.observation
+
+    def step(self, action):
+        """Advance the match by one tick.
+
+        Args:
+            action (int): 0 to stand still, 1 to move up, 2 to move down.
+
+        Returns:
+            (array, float, bool, dict): The observation, the reward (+1 if
+            the agent scored, -1 if the opponent scored), whether the
+            episode is over and the current scores.
+        """
+        reward, done = self.advance(action)
+        self.observe(self.observation)
+        return self.observation, reward, done, self.info
+
+    def advance(self, action):
+        """Advance the match by one tick without writing an observation.
+
+        Returns:
+            (float, bool): The reward and whether the episode is over.
+        """
+        self.agent.direction = PongEnv.ACTIONS[action]
+        self.game.step()
+
+        score, opponent_score = self._scores()
+        reward = (score - self._score) - (opponent_score - self._opponent_score)
+        self._score = score
+        self._opponent_score = opponent_score
+        self.info["player1_score"] = self.game.state.player1_score
+        self.info["player2_score"] = self.game.state.player2_score
+
+        return float(reward), self.game.finished(self.max_score, self.max_steps)
+
+
+class VectorPongEnv:
+    """Steps several `PongEnv`s with one call.
+
+    Observations, rewards and done flags of all environments are written
+    into flat preallocated arrays. Environments whose episode ended are
+    reset automatically, in which case their slot holds the first
+    observation of the next episode.
+
+    Args:
+        num_envs (int): Number of environments.
+        seed (int): Seed from which the seed of every environment is derived.
+        **kwargs: Arguments passed on to every `PongEnv`.
+
+    Attributes:
+        envs (List[PongEnv])
+        observations (array): `num_envs * PongEnv.OBSERVATION_SIZE` values,
+            one observation after another.
+        rewards (array): The reward of each environment in the last step.
+        dones (array): 1 where the episode ended in the last step.
+    """
+
+    def __init__(self, num_envs, seed=None, **kwargs):
+        self.num_envs = num_envs
+        self.envs = [
+            PongEnv(seed=None if seed is None else f"{seed}:{i}", **kwargs)
+            for i in range(num_envs)
+        ]
+        self.observations = array("d", bytes(8 * num_envs * PongEnv.OBSERVATION_SIZE))
+        self.rewards = array("d", bytes(8 * num_envs))
+        self.dones = array("b", bytes(num_envs))
+
+    def reset(self):
+        """Reset every environment.
+
+        Returns:
+            array: The first observation of every environment.
+        """
+        size = PongEnv.OBSERVATION_SIZE
+        for i, env in enumerate(self.envs):
+            env.reset()
+            env.observe(self.observations, i * size)
+        return self.observations
+
+    def step(self, actions):
+        """Advance every environment by one tick.
+
+        Args:
+            actions (Sequence[int]): One action per environment.
+
+        Returns:
+            (array, array, array): Observations, rewards and done flags.
+        """
+        size = PongEnv.OBSERVATION_SIZE
+        observations = self.observations
+        rewards = self.rewards
+        dones = self.dones
+        for i, env in enumerate(self.envs):
+            reward, done = env.advance(actions[i])
+            if done:
+                env.reset()
+            env.observe(observations, i * size)
+            rewards[i] = reward
+            dones[i] = done
+        return observations, rewards, dones
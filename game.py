@@ -1,6 +1,11 @@
 import pygame
+import snapshot
 import sys
+from collections import OrderedDict
+from assets import Atlas
+from broadphase import UniformGrid
 from colors import *
+from dispatcher import InputDispatcher
 from pygame.locals import *
 
 
@@ -10,15 +15,54 @@ class Game:
     Args:
         size ((int, int))
         color: (Color or (int, int, int))
+        headless (bool): If True, no display is opened and the game loop
+            runs the simulation as fast as possible without rendering.
+        tick_rate (int): Simulation steps per second of game time.
+        fps (int): Maximum frames rendered per second, or None to render
+            as often as the display allows.
+        interpolate (bool): If True, sprites are drawn between their
+            previous and current positions according to how far the
+            renderer is into the next tick.
+        seed (int): Seed of the game's random number generators. Games
+            with the same seed and inputs play out identically.
+        profiler (FrameProfiler): If given, the time spent in each phase
+            of every frame is measured.
+        window_size ((int, int)): Size of the window. Defaults to `size`.
+            The field is scaled to fit it, keeping its aspect ratio.
+        render_scale (float): Resolution frames are rendered at, as a
+            fraction of the resolution of the field in the window. Lower
+            values are scaled up more, trading sharpness for frame rate.
+        smooth_scaling (bool): Whether frames are scaled to the window
+            with filtering instead of by repeating pixels.
     
     Attributes:
         state (State): The current state of the game.
-        screen (Surface): The display surface.
-        background (Surface): The background surface.
+        area (Rect): The playing field. Everything is simulated in these
+            coordinates, whatever the size of the window.
+        headless (bool): Whether the game runs without a display.
+        window (Surface): The display surface (None when headless).
+        screen (Surface): The surface sprites are drawn on: the display
+            surface, or one at the render resolution that is scaled to
+            the window every frame (None when headless).
+        scale (float): Size of a unit of `area` on `screen` in pixels.
+        viewport (Rect): Where the field is shown in the window.
+        background (Surface): The background surface (None when headless).
+        atlas (Atlas): Pre-rendered sprite images (None when headless).
         spritegroups: A dictionary of all sprite groups in the game.
             The key is the name of the group and the value is a reference
             to the Group.
         events (List[event]): pygame events from the current frame.
+        input (InputDispatcher): Routes input events to handlers and
+            tracks the state of keys and joysticks.
+        ticks (int): Number of simulation steps run so far.
+        rng (Random): Random number generator for the physics.
+        previous_rects (Dict[Sprite, Rect]): Where each sprite was before
+            the last step, used for interpolation.
+        listeners (List[Callable[[Game], None]]): Called after every step.
+        grids (Dict[str, UniformGrid]): Spatial indexes of sprite groups,
+            keyed by the name of the group.
+        drawn (Dict[Sprite, (Rect, Surface)]): Where each sprite was last
+            drawn and with which image, used to find the dirty areas.
     """
 
     class State:
@@ -27,30 +71,121 @@ class Game:
         Attributes:
             player1_score (int)
             player2_score (int)
+            revision (int): Incremented whenever the scores change, so
+                anything displaying them can tell when to update.
         """
 
         def __init__(self):
             self.player1_score = 0
             self.player2_score = 0
+            self.revision = 0
 
         def player1_scored(self):
             self.player1_score += 1
+            self.revision += 1
 
         def player2_scored(self):
             self.player2_score += 1
+            self.revision += 1
 
         def reset_scores(self):
             self.player1_score = 0
             self.player2_score = 0
+            self.revision += 1
 
-    def __init__(self, size, color):
-        pygame.init()
-        self.screen = pygame.display.set_mode(size)
-        pygame.display.set_caption("Pong")
+    def __init__(
+        self,
+        size,
+        color,
+        headless=False,
+        tick_rate=60,
+        fps=60,
+        interpolate=False,
+        seed=None,
+        profiler=None,
+        window_size=None,
+        render_scale=1,
+        smooth_scaling=False,
+    ):
+        self.area = pygame.Rect((0, 0), size)
+        self.headless = headless
+        self.tick_rate = tick_rate
+        self.fps = fps
+        self.interpolate = interpolate
+        self.seed = seed
+        self.profiler = profiler
+        self.rng = self.make_rng("physics")
+        self.smooth_scaling = smooth_scaling
+        self._scaled_images = OrderedDict()
+        if headless:
+            self.window = None
+            self.screen = None
+            self.scale = 1
+            self.viewport = None
+            self.background = None
+            self.atlas = None
+        else:
+            # Only the modules the game uses are started, not audio
+            pygame.display.init()
+            pygame.font.init()
+            pygame.joystick.init()
+            if window_size is None:
+                window_size = size
+            self.window = pygame.display.set_mode(window_size)
+            pygame.display.set_caption("Pong")
+            fit = min(window_size[0] / size[0], window_size[1] / size[1])
+            self.viewport = pygame.Rect(
+                0, 0, round(size[0] * fit), round(size[1] * fit)
+            )
+            self.viewport.center = self.window.get_rect().center
+            self.scale = fit * render_scale
+            screen_size = (round(size[0] * self.scale), round(size[1] * self.scale))
+            if screen_size == tuple(window_size):
+                # Sprites are drawn straight onto the display
+                self.screen = self.window
+            else:
+                self.screen = pygame.Surface(screen_size).convert()
+                self._viewport_surface = self.window.subsurface(self.viewport)
+                zoom, remainder = divmod(self.viewport.width, screen_size[0])
+                if remainder or self.viewport.height != screen_size[1] * zoom:
+                    zoom = None
+                self._zoom = zoom
+            self.background = self.make_background(color)
+            self.atlas = Atlas()
         self.state = Game.State()
-        self.background = self.make_background(color)
         self.spritegroups = {}
         self.movement_managers = []
+        self.events = []
+        self.input = InputDispatcher()
+        self.input.subscribe(QUIT, None, self.quit)
+        self.input.subscribe(KEYDOWN, K_ESCAPE, self.quit)
+        self.ticks = 0
+        self.drawn = {}
+        self.previous_rects = {}
+        self.listeners = []
+        self.grids = {}
+
+    def quit(self, event=None):
+        """Close the window and exit."""
+        pygame.quit()
+        sys.exit()
+
+    def make_rng(self, name):
+        """Create a random number generator derived from the game's seed.
+
+        Every part of the game that needs randomness gets its own stream,
+        so for example an AI drawing numbers doesn't change the angles the
+        ball is launched at.
+
+        Args:
+            name (str): The name of the stream.
+
+        Returns:
+            snapshot.Random
+        """
+        if self.seed is None:
+            return snapshot.Random()
+        return snapshot.Random(f"{self.seed}:{name}")
 
     def make_background(self, color):
         """Create a background surface.
@@ -69,6 +204,7 @@ class Game:
             (250, 250, 250),
             background.get_rect().midtop,
             background.get_rect().midbottom,
+            max(1, round(self.scale)),
         )
         return background
 
@@ -114,6 +250,28 @@ class Game:
             for sprite in spritegroup.sprites():
                 self.add_sprite(sprite)
 
+    def index_spritegroup(self, name, cell_size=64):
+        """Track the sprites of a group in a uniform grid.
+
+        Collision checks and nearest-sprite lookups against the group can
+        then use the grid instead of testing every sprite. The sprites
+        keep their cells up to date when they move. Only the sprites in
+        the group at the time of the call are tracked.
+
+        Args:
+            name (str): The name of the spritegroup.
+            cell_size (int): Width and height of the grid cells.
+
+        Returns:
+            UniformGrid: The grid.
+        """
+        grid = UniformGrid(self.area, cell_size)
+        for sprite in self.spritegroups[name].sprites():
+            grid.insert(sprite)
+            sprite.grid = grid
+        self.grids[name] = grid
+        return grid
+
     def add_movement_managers(self, movement_managers):
         """Adds reference to movement managers in Game.
         
@@ -122,6 +280,26 @@ class Game:
         """
         self.movement_managers.extend(movement_managers)
 
+    def add_listeners(self, listeners):
+        """Adds functions that are called with the game after every step.
+
+        Args:
+            listeners (List[Callable[[Game], None]])
+        """
+        self.listeners.extend(listeners)
+
+    def snapshot(self):
+        """Return a snapshot of the state of the simulation, see `snapshot.take`."""
+        return snapshot.take(self)
+
+    def restore(self, state):
+        """Go back to a snapshot returned by `snapshot`.
+
+        The next frame is not interpolated, since the sprites jumped.
+        """
+        snapshot.restore(self, state)
+        self.previous_rects.clear()
+
     def update_movement_managers(self):
         """Update all movement managers."""
         for movement_manager in self.movement_managers:
@@ -130,42 +308,334 @@ class Game:
     def initial_frame(self):
         """Blit initial frame onto display surface."""
         self.screen.blit(self.background, (0, 0))
+        self.drawn = {}
+        if self.screen is not self.window:
+            # Bars beside the field where its aspect ratio differs from the window's
+            self.window.fill(BLACK)
+            self.scale_to_window()
         pygame.display.update()
 
     def update_frame(self):
-        """Clear sprites from screen and re-render them based on new values
+        """Update all sprites and render them based on their new values."""
+        for spritegroup in self.spritegroups.values():
+            spritegroup.update()
+        self.render()
+
+    def render(self, alpha=None, drawables=None):
+        """Clear sprites from screen and re-render them at their current positions
         
-        Blits the background onto all sprites in the game and then
-        blits the sprites with new locations onto the screen again.
+        Blits the background over where every sprite was last drawn and
+        blits the sprites at their new locations. Only the areas of
+        sprites that moved or changed their image (the union of their old
+        and new rects) are pushed to the display.
+
+        Args:
+            alpha (float): How far (0 to 1) the renderer is into the next
+                tick. If given, sprites are drawn between their previous
+                and current positions.
+            drawables (Iterable[(object, Surface, Rect)]): What to draw,
+                see `drawables`. Defaults to the sprites of the game.
+        """
+        screen = self.screen
+        background = self.background
+        for rect, _ in self.drawn.values():
+            screen.blit(background, rect, rect)
+
+        drawn = {}
+        dirty = []
+        if drawables is None:
+            drawables = self.drawables(alpha)
+        for key, image, rect in drawables:
+            screen.blit(image, rect)
+            old = self.drawn.pop(key, None)
+            if old is None:
+                dirty.append(rect)
+            elif old[0] != rect or old[1] is not image:
+                dirty.append(rect.union(old[0]))
+            drawn[key] = (rect, image)
+
+        # Sprites that were removed from their groups since the last frame
+        for rect, _ in self.drawn.values():
+            dirty.append(rect)
+
+        self.drawn = drawn
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.mark("draw")
+        if dirty:
+            if self.screen is not self.window:
+                dirty = self.scale_to_window(dirty)
+            pygame.display.update(dirty)
+        latency = self.input.presented()
+        if profiler is not None:
+            profiler.mark("display")
+            if latency is not None:
+                profiler.record_latency(latency)
+
+    def drawables(self, alpha=None):
+        """Yield everything that is drawn on screen.
+
+        Args:
+            alpha (float): See `render`.
+
+        Yields:
+            (object, Surface, Rect): A key identifying the drawable, its
+            image and where to draw it on `screen`.
         """
         for spritegroup in self.spritegroups.values():
             for sprite in spritegroup.sprites():
-                self.screen.blit(self.background, sprite.rect, sprite.rect)
-            spritegroup.update()
-            spritegroup.draw(self.screen)
-        pygame.display.update()
+                if alpha is None:
+                    rect = sprite.rect.copy()
+                else:
+                    rect = self.interpolated_rect(sprite, alpha)
+                yield self.drawable(sprite, rect)
+        yield from self.overlays()
+
+    def drawable(self, sprite, rect):
+        """Return how to draw a sprite at `rect`, in field coordinates.
+
+        Returns:
+            (Sprite, Surface, Rect): The sprite, its image at the render
+            scale and where to draw it on `screen`.
+        """
+        scale = self.scale
+        if scale == 1:
+            return sprite, sprite.image, rect
+        image = self.scaled_image(sprite.image, sprite)
+        topleft = (round(rect.x * scale), round(rect.y * scale))
+        return sprite, image, image.get_rect(topleft=topleft)
+
+    def overlays(self):
+        """Yield what is drawn over the field, see `drawables`."""
+        if self.profiler is not None and self.profiler.overlay:
+            # Drawn at the render resolution, so it stays readable when scaled up
+            image = self.profiler.overlay_image()
+            rect = image.get_rect(bottomleft=(10, self.screen.get_height() - 10))
+            yield self.profiler, image, rect
+
+    def scaled_image(self, image, sprite=None):
+        """Return an image drawn at `scale`.
+
+        Sprites with a `scaled_image` method draw themselves at a scale,
+        such as text rendered at a larger font size, and images from the
+        atlas are drawn into it again. Any other image is scaled, and the
+        result kept while it is in use.
+
+        Args:
+            image (Surface)
+            sprite (Sprite): The sprite showing the image, if any.
+
+        Returns:
+            Surface: The shared image at the render scale.
+        """
+        draw = getattr(sprite, "scaled_image", None)
+        if draw is not None:
+            return draw(self.scale)
+        scaled = self.atlas.scaled(image, self.scale)
+        if scaled is not None:
+            return scaled
+
+        scaled_images = self._scaled_images
+        scaled = scaled_images.get(image)
+        if scaled is None:
+            width, height = image.get_size()
+            size = (round(width * self.scale), round(height * self.scale))
+            scaled = scaled_images[image] = pygame.transform.smoothscale(image, size)
+            if len(scaled_images) > 64:
+                scaled_images.popitem(last=False)
+        else:
+            scaled_images.move_to_end(image)
+        return scaled
+
+    def scale_to_window(self, dirty=None):
+        """Scale the frame on `screen` into the viewport of the window.
+
+        When the viewport is a whole multiple of the render resolution
+        every pixel of `screen` becomes a block of pixels of its own, so
+        only the areas that changed are scaled. Otherwise the whole frame
+        is.
+
+        Args:
+            dirty (List[Rect]): The areas of `screen` that changed, or
+                None to scale everything.
+
+        Returns:
+            List[Rect]: The areas of the window that changed.
+        """
+        screen = self.screen
+        target = self._viewport_surface
+        zoom = self._zoom
+        if dirty is None or zoom is None or self.smooth_scaling:
+            if self.smooth_scaling:
+                pygame.transform.smoothscale(screen, self.viewport.size, target)
+            else:
+                pygame.transform.scale(screen, self.viewport.size, target)
+            return [self.viewport]
+
+        bounds = screen.get_rect()
+        left, top = self.viewport.topleft
+        changed = []
+        for rect in dirty:
+            rect = rect.clip(bounds)
+            if not rect.width or not rect.height:
+                continue
+            scaled = pygame.Rect(
+                rect.x * zoom, rect.y * zoom, rect.width * zoom, rect.height * zoom
+            )
+            pygame.transform.scale(
+                screen.subsurface(rect), scaled.size, target.subsurface(scaled)
+            )
+            changed.append(scaled.move(left, top))
+        return changed
+
+    def interpolated_rect(self, sprite, alpha):
+        """Return the rect of a sprite between its previous and current position.
+
+        Jumps of more than a quarter of the field (such as the ball being
+        reset after a goal) are not interpolated.
+        """
+        rect = sprite.rect.copy()
+        previous = self.previous_rects.get(sprite)
+        if previous is not None:
+            dx = rect.x - previous.x
+            dy = rect.y - previous.y
+            if abs(dx) < self.area.width / 4 and abs(dy) < self.area.height / 4:
+                rect.x = previous.x + round(dx * alpha)
+                rect.y = previous.y + round(dy * alpha)
+        return rect
+
+    def step(self, profiler=None):
+        """Advance the simulation by one tick without rendering anything.
+
+        Args:
+            profiler (FrameProfiler): Measures the phases of the step
+                instead of the game's profiler, such as when stepping on
+                another thread than the one rendering.
+        """
+        if self.interpolate:
+            for spritegroup in self.spritegroups.values():
+                for sprite in spritegroup.sprites():
+                    self.previous_rects[sprite] = sprite.rect.copy()
+        if profiler is None:
+            profiler = self.profiler
+        self.update_movement_managers()
+        self.input.stepped()
+        if profiler is None:
+            for spritegroup in self.spritegroups.values():
+                spritegroup.update()
+        else:
+            profiler.mark("movement_managers")
+            for name, spritegroup in self.spritegroups.items():
+                spritegroup.update()
+                profiler.mark("update." + name)
+        self.ticks += 1
+        for listener in self.listeners:
+            listener(self)
+        if profiler is not None:
+            profiler.mark("listeners")
+
+    def finished(self, max_score=None, max_ticks=None):
+        """Check whether a match has reached one of its stopping conditions.
+
+        Args:
+            max_score (int): Stop once either player reaches this score.
+            max_ticks (int): Stop after this many simulation steps.
+
+        Returns:
+            bool: True if the match is over.
+        """
+        if max_score is not None and (
+            self.state.player1_score >= max_score
+            or self.state.player2_score >= max_score
+        ):
+            return True
+        return max_ticks is not None and self.ticks >= max_ticks
+
+    def run_headless(self, max_score=None, max_ticks=None):
+        """Run the simulation as fast as possible until the match is over.
+
+        No events are polled, nothing is drawn and the frame rate is not
+        capped, so throughput is only limited by the physics step.
+
+        Args:
+            max_score (int): Stop once either player reaches this score.
+            max_ticks (int): Stop after this many simulation steps.
+
+        Returns:
+            State: The state of the game at the end of the match.
+        """
+        if max_score is None and max_ticks is None:
+            raise ValueError("a headless run needs max_score or max_ticks")
+        step = self.step
+        finished = self.finished
+        profiler = self.profiler
+        if profiler is None:
+            while not finished(max_score, max_ticks):
+                step()
+        else:
+            # Every step counts as a frame
+            while not finished(max_score, max_ticks):
+                profiler.begin_frame()
+                step()
+                profiler.end_frame()
+        return self.state
+
+    def startloop(self, max_score=None, max_ticks=None):
+        """Run the game loop.
+
+        When the game is headless this delegates to `run_headless`.
+        Otherwise the simulation advances in fixed steps of 1/tick_rate
+        seconds of real time, however many frames are rendered, until
+        the window is closed or one of the stopping conditions is met.
+
+        Args:
+            max_score (int): Stop once either player reaches this score.
+            max_ticks (int): Stop after this many simulation steps.
+
+        Returns:
+            State: The state of the game at the end of the match.
+        """
+        if self.headless:
+            return self.run_headless(max_score, max_ticks)
 
-    def startloop(self):
         self.initial_frame()
         clock = pygame.time.Clock()
-        while True:
-            clock.tick(60)
+        tick_length = 1000 / self.tick_rate
+        accumulator = 0
+        while not self.finished(max_score, max_ticks):
+            # Cap the catch-up after a stall so the game doesn't fall further
+            # and further behind trying to simulate it
+            accumulator += min(clock.tick(self.fps or 0), 250)
+            profiler = self.profiler
+            if profiler is not None:
+                profiler.begin_frame()
 
-            # Store events in a list to be available to player-controlled sprites
-            self.events = []
+            # Route events to their handlers. They are also stored in a list
+            # for code that wants to see all of them, and kept until a step
+            # has run so no input is lost on frames without a step.
+            dispatch = self.input.dispatch
             for event in pygame.event.get():
-                if event.type == QUIT:
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == KEYDOWN and event.key == K_ESCAPE:
-                    pygame.quit()
-                    sys.exit()
-                else:
-                    self.events.append(event)
+                dispatch(event)
+                self.events.append(event)
+            if profiler is not None:
+                profiler.mark("events")
 
-            # Update paddle movement direction based on keyboard events (manual)
-            # or the state of other game sprites (AI)
-            self.update_movement_managers()
+            while accumulator >= tick_length and not self.finished(
+                max_score, max_ticks
+            ):
+                # Update paddle movement direction based on keyboard events
+                # (manual) or the state of other game sprites (AI), then
+                # move the sprites
+                self.step()
+                self.events.clear()
+                accumulator -= tick_length
 
             # Clear sprites from screen and re-render them based on new values
-            self.update_frame()
+            if self.interpolate:
+                self.render(accumulator / tick_length)
+            else:
+                self.render()
+            if profiler is not None:
+                profiler.end_frame()
+
+        return self.state
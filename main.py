@@ -7,51 +7,271 @@ Released under the GNU General Public License.
 
 VERSION = "0.1.0"
 
+import argparse
+import atexit
 import pygame
-import sys
+import controllers
 from game import Game
-from colors import *
-from objects import *
-from movement_managers import *
-from pygame.locals import *
+from colors import THEMES
+from objects import Ball, Paddle, Score
+from pipeline import Pipeline
+from telemetry import JSONLinesWriter, Telemetry
 
 
 SIZE = WIDTH, HEIGHT = 640, 480
 
 
-def main():
+def make_movement_manager(paddle, controller):
+    """Create the movement manager that controls a paddle.
+
+    Args:
+        paddle (Paddle): The paddle being controlled.
+        controller (str or Callable[[Paddle], PaddleMovementManager]):
+            The name of a controller in the `controllers` registry (such
+            as "basic" or "advanced"), or a function that creates a
+            movement manager for the paddle.
+
+    Returns:
+        PaddleMovementManager
+    """
+    if callable(controller):
+        return controller(paddle)
+    return controllers.get(controller)(paddle)
+
+
+def setup_game(
+    headless=False,
+    player1="basic",
+    player2="advanced",
+    balls=1,
+    paddles_per_side=1,
+    size=SIZE,
+    ball_speed=5,
+    ball_maxspeed=15,
+    paddle_speed=5,
+    paddle_width=Paddle.WIDTH,
+    paddle_height=Paddle.HEIGHT,
+    theme="classic",
+    **kwargs,
+):
+    """Create a game with paddles on both sides and one or more balls.
+
+    With more than one ball or paddle per side ("chaos" mode) the paddles
+    and balls are tracked in grids, so collision checks and the AI's
+    choice of ball don't scan every sprite.
+
+    Args:
+        headless (bool): If True, no display is opened and no score
+            sprites are created, so the match can only be simulated.
+        player1: Controller of the right paddles, see `make_movement_manager`.
+        player2: Controller of the left paddles, see `make_movement_manager`.
+        balls (int): Number of balls in play.
+        paddles_per_side (int): Number of paddles on each side, spread
+            out towards the center line.
+        size ((int, int)): Width and height of the field.
+        ball_speed (int or float): The initial speed of the balls.
+        ball_maxspeed (int or float): The speed the balls can not exceed.
+        paddle_speed (int or float): Distance a paddle moves per tick.
+        paddle_width (int)
+        paddle_height (int)
+        theme (str): The colors of the game, one of `colors.THEMES`.
+        **kwargs: Further arguments for `Game`, such as the seed or tick rate.
+
+    Returns:
+        Game: The game, ready for `startloop`.
+    """
     # Setup
-    game = Game(SIZE, DARKGRAY)
+    color, field_color = THEMES[theme]
+    game = Game(size, field_color, headless=headless, **kwargs)
+    if headless:
+        ball_image = paddle_image = None
+    else:
+        # Every theme is drawn up front, so changing themes costs nothing
+        sizes = {
+            "ball": (Ball.WIDTH, Ball.HEIGHT),
+            "paddle": (paddle_width, paddle_height),
+        }
+        game.atlas.prerender(
+            sizes, [colors[0] for colors in THEMES.values()], {1, game.scale}
+        )
+        ball_image = game.atlas.image("ball", sizes["ball"], color)
+        paddle_image = game.atlas.image("paddle", sizes["paddle"], color)
 
     # Initialize sprites
-    paddle1 = Paddle("right")
-    paddle2 = Paddle("left")
-    player1_score = Player1Score()
-    player2_score = Player2Score()
-    ball = Ball(speed=5, maxspeed=15)
+    spacing = game.area.width // (2 * paddles_per_side)
+    player1_paddles = [
+        Paddle(
+            "right",
+            game.area,
+            i * spacing,
+            paddle_speed,
+            paddle_width,
+            paddle_height,
+            paddle_image,
+        )
+        for i in range(paddles_per_side)
+    ]
+    player2_paddles = [
+        Paddle(
+            "left",
+            game.area,
+            i * spacing,
+            paddle_speed,
+            paddle_width,
+            paddle_height,
+            paddle_image,
+        )
+        for i in range(paddles_per_side)
+    ]
+    ball_list = [
+        Ball(ball_speed, ball_maxspeed, game.area, game.rng, ball_image)
+        for _ in range(balls)
+    ]
 
     # Add sprites to groups
-    paddlesprites = pygame.sprite.RenderPlain((paddle1, paddle2))
-    scoresprites = pygame.sprite.RenderPlain((player1_score, player2_score))
-    ballsprite = pygame.sprite.GroupSingle(ball)
+    paddlesprites = pygame.sprite.RenderPlain(player1_paddles + player2_paddles)
+    if balls == 1:
+        ballsprite = pygame.sprite.GroupSingle(ball_list[0])
+    else:
+        ballsprite = pygame.sprite.RenderPlain(ball_list)
+    spritegroups = {"paddlesprites": paddlesprites}
+    if not headless:
+        player1_score = Score(1, game.area, color)
+        player2_score = Score(2, game.area, color)
+        scoresprites = pygame.sprite.RenderPlain((player1_score, player2_score))
+        spritegroups["scoresprites"] = scoresprites
+    spritegroups["ballsprite"] = ballsprite
 
     # Add groups (and the other groups they depend on) to the game
-    game.add_spritegroups(
-        {
-            "paddlesprites": paddlesprites,
-            "scoresprites": scoresprites,
-            "ballsprite": ballsprite,
-        }
-    )
+    game.add_spritegroups(spritegroups)
+    if balls > 1 or paddles_per_side > 1:
+        game.index_spritegroup("paddlesprites")
+        game.index_spritegroup("ballsprite")
 
     # Initialize objects to control paddle movement (manually or by AI)
-    player1_movement_manager = PaddleMovementManager_AI(paddle1, "basic")
-    player2_movement_manager = PaddleMovementManager_AI(paddle2, "advanced")
+    movement_managers = [
+        make_movement_manager(paddle, player1) for paddle in player1_paddles
+    ] + [make_movement_manager(paddle, player2) for paddle in player2_paddles]
 
     # Add movement manager objects to game
-    game.add_movement_managers([player1_movement_manager, player2_movement_manager])
+    game.add_movement_managers(movement_managers)
+
+    return game
+
+
+def parse_size(text):
+    """Parse a size given as "WIDTHxHEIGHT"."""
+    try:
+        width, height = (int(part) for part in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{text!r} is not WIDTHxHEIGHT")
+    return width, height
+
 
-    game.startloop()
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description="Play Pong.")
+    parser.add_argument(
+        "--player1", default="basic", help="controller of the right paddle"
+    )
+    parser.add_argument(
+        "--player2", default="advanced", help="controller of the left paddle"
+    )
+    parser.add_argument(
+        "--list-controllers", action="store_true", help="list controllers and exit"
+    )
+    parser.add_argument(
+        "--size", type=parse_size, default=SIZE, help="field size, e.g. 800x600"
+    )
+    parser.add_argument("--ball-speed", type=float, default=5)
+    parser.add_argument("--ball-maxspeed", type=float, default=15)
+    parser.add_argument("--paddle-speed", type=float, default=5)
+    parser.add_argument("--paddle-width", type=int, default=Paddle.WIDTH)
+    parser.add_argument("--paddle-height", type=int, default=Paddle.HEIGHT)
+    parser.add_argument("--theme", choices=sorted(THEMES), default="classic")
+    parser.add_argument("--balls", type=int, default=1)
+    parser.add_argument("--paddles-per-side", type=int, default=1)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--tick-rate", type=int, default=60)
+    parser.add_argument("--fps", type=int, default=60, help="0 for unlimited")
+    parser.add_argument("--interpolate", action="store_true")
+    parser.add_argument(
+        "--window-size", type=parse_size, help="window size, e.g. 3840x2160"
+    )
+    parser.add_argument(
+        "--render-scale",
+        type=float,
+        default=1,
+        help="resolution to render at relative to the window's, e.g. 0.5",
+    )
+    parser.add_argument(
+        "--smooth-scaling", action="store_true", help="filter when scaling frames"
+    )
+    parser.add_argument(
+        "--headless", action="store_true", help="simulate without a display"
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="simulate on a worker thread while rendering on the main thread",
+    )
+    parser.add_argument("--max-score", type=int, help="end the match at this score")
+    parser.add_argument("--max-ticks", type=int, help="end the match after this tick")
+    parser.add_argument("--telemetry", help="write telemetry to this JSON lines file")
+    parser.add_argument(
+        "--telemetry-every", type=int, default=1, help="ticks between telemetry samples"
+    )
+    args = parser.parse_args(args)
+    if args.headless and args.max_score is None and args.max_ticks is None:
+        parser.error("--headless needs --max-score or --max-ticks")
+    if args.render_scale <= 0:
+        parser.error("--render-scale must be positive")
+    for name in (args.player1, args.player2):
+        try:
+            controllers.get(name)
+        except (ValueError, ImportError, AttributeError) as error:
+            parser.error(str(error))
+    return args
+
+
+def main(args=None):
+    args = parse_args(args)
+    if args.list_controllers:
+        for name in controllers.names():
+            print(name)
+        return
+
+    game = setup_game(
+        args.headless,
+        args.player1,
+        args.player2,
+        balls=args.balls,
+        paddles_per_side=args.paddles_per_side,
+        size=args.size,
+        ball_speed=args.ball_speed,
+        ball_maxspeed=args.ball_maxspeed,
+        paddle_speed=args.paddle_speed,
+        paddle_width=args.paddle_width,
+        paddle_height=args.paddle_height,
+        theme=args.theme,
+        seed=args.seed,
+        tick_rate=args.tick_rate,
+        fps=args.fps or None,
+        interpolate=args.interpolate,
+        window_size=args.window_size,
+        render_scale=args.render_scale,
+        smooth_scaling=args.smooth_scaling,
+    )
+    if args.telemetry is not None:
+        telemetry = Telemetry([JSONLinesWriter(args.telemetry)], args.telemetry_every)
+        game.add_listeners([telemetry])
+        # Also closed when the window is closed, which exits from the loop
+        atexit.register(telemetry.close)
+    if args.pipeline:
+        state = Pipeline(game).run(max_score=args.max_score, max_ticks=args.max_ticks)
+    else:
+        state = game.startloop(max_score=args.max_score, max_ticks=args.max_ticks)
+    if args.headless:
+        print(f"{state.player1_score}-{state.player2_score} after {game.ticks} ticks")
 
 
 if __name__ == "__main__":
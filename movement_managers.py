@@ -1,8 +1,10 @@
 import math
-import pygame
 import random
 from abc import ABC, abstractmethod
-from pygame.locals import *
+from time import perf_counter
+from broadphase import threat_ball
+from objects import Ball
+from trajectory import TrajectoryPredictor
 
 
 class PaddleMovementManager(ABC):
@@ -17,6 +19,14 @@ class PaddleMovementManager(ABC):
     def update(self):
         pass
 
+    def snapshot(self):
+        """Return the state of the manager as an immutable value, see `snapshot`."""
+        return (self.moveup, self.movedown)
+
+    def restore(self, state):
+        """Go back to a state returned by `snapshot`."""
+        self.moveup, self.movedown = state
+
     def move(self, custom_amount=None):
         """Sets movemement direction of paddle.
         
@@ -36,7 +46,10 @@ class PaddleMovementManager(ABC):
 
 class PaddleMovementManager_Manual(PaddleMovementManager):
     """Controls paddle movement based on user input.
-    
+
+    The keys are watched by the game's `InputDispatcher`, so on every
+    tick only their bits are read instead of going through the events.
+
     Args:
         paddle (Sprite): the paddle being controlled.
         moveup_key (pygame.key): The key that should move the paddle up
@@ -47,30 +60,179 @@ class PaddleMovementManager_Manual(PaddleMovementManager):
         super().__init__(paddle)
         self.moveup_key = moveup_key
         self.movedown_key = movedown_key
+        self.moveup_mask = None
+        self.movedown_mask = None
 
     def update(self):
-        """Determines and sets the movement direction of a paddle based on event queue."""
-        for event in self.paddle.game.events:
-            if event.type == KEYDOWN:
-                if event.key == self.moveup_key:
-                    self.moveup = True
-                if event.key == self.movedown_key:
-                    self.movedown = True
-            elif event.type == KEYUP:
-                if event.key == self.moveup_key:
-                    self.moveup = False
-                if event.key == self.movedown_key:
-                    self.movedown = False
+        """Sets the movement direction of a paddle based on the keys held down."""
+        dispatcher = self.paddle.game.input
+        if self.moveup_mask is None:
+            self.moveup_mask = dispatcher.watch_key(self.moveup_key)
+            self.movedown_mask = dispatcher.watch_key(self.movedown_key)
+        buttons = dispatcher.buttons
+        self.moveup = bool(buttons & self.moveup_mask)
+        self.movedown = bool(buttons & self.movedown_mask)
+        self.move()
+
+
+class PaddleMovementManager_Joystick(PaddleMovementManager):
+    """Controls paddle movement with a joystick or gamepad.
+
+    The paddle moves at a speed proportional to how far the stick is
+    pushed beyond the dead zone.
+
+    Args:
+        paddle (Sprite): the paddle being controlled.
+        joystick (int): Number of the joystick, in the order they were
+            connected.
+        axis (int): The axis that moves the paddle, 1 being the vertical
+            axis of the left stick on most gamepads.
+        dead_zone (float): How far the stick can be pushed before the
+            paddle moves, so a stick that doesn't fully center doesn't
+            make it drift.
+    """
+
+    def __init__(self, paddle, joystick=0, axis=1, dead_zone=0.2):
+        super().__init__(paddle)
+        self.joystick = joystick
+        self.axis = axis
+        self.dead_zone = dead_zone
+
+    def update(self):
+        """Sets the movement of a paddle based on the position of the stick."""
+        value = self.paddle.game.input.axis(self.joystick, self.axis)
+        self.moveup = value < -self.dead_zone
+        self.movedown = value > self.dead_zone
+        amount = (abs(value) - self.dead_zone) / (1 - self.dead_zone)
+        self.move(max(amount, 0) * self.paddle.speed)
+
+
+class PaddleMovementManager_Action(PaddleMovementManager):
+    """Controls paddle movement based on an action set by outside code.
+
+    This is used when something other than the game decides how the
+    paddle moves, such as a learning agent stepping an environment.
+
+    Args:
+        paddle (Sprite): the paddle being controlled.
+
+    Attributes:
+        direction (int): -1 to move up, 1 to move down, 0 to stand still.
+    """
+
+    def __init__(self, paddle):
+        super().__init__(paddle)
+        self.direction = 0
 
+    def snapshot(self):
+        return (super().snapshot(), self.direction)
+
+    def restore(self, state):
+        base, self.direction = state
+        super().restore(base)
+
+    def update(self):
+        """Sets the movement direction of a paddle based on `direction`."""
+        self.moveup = self.direction < 0
+        self.movedown = self.direction > 0
         self.move()
 
 
+class PaddleMovementManager_Network(PaddleMovementManager_Action):
+    """Controls paddle movement based on input received over the network.
+
+    Inputs can arrive at any time between ticks. They are batched, and on
+    each tick only the newest one is applied.
+
+    Args:
+        paddle (Sprite): the paddle being controlled.
+
+    Attributes:
+        sequence (int): Sequence number of the newest input received.
+        applied_sequence (int): Sequence number of the input applied on
+            the last tick.
+    """
+
+    def __init__(self, paddle):
+        super().__init__(paddle)
+        self.pending = 0
+        self.sequence = 0
+        self.applied_sequence = 0
+
+    def snapshot(self):
+        return (super().snapshot(), self.pending, self.sequence, self.applied_sequence)
+
+    def restore(self, state):
+        base, self.pending, self.sequence, self.applied_sequence = state
+        super().restore(base)
+
+    def reset(self):
+        """Forget the inputs of the last client, so a new one can start over at 1.
+
+        The paddle stops on the next tick.
+        """
+        self.pending = 0
+        self.sequence = 0
+        self.applied_sequence = 0
+
+    def receive(self, sequence, direction):
+        """Queue an input from the client, dropping it if it arrived out of order."""
+        if sequence > self.sequence:
+            self.sequence = sequence
+            self.pending = direction
+
+    def update(self):
+        """Apply the newest input received since the last tick."""
+        self.direction = self.pending
+        self.applied_sequence = self.sequence
+        super().update()
+
+
+class PaddleMovementManager_Replay(PaddleMovementManager):
+    """Controls paddle movement by replaying previously recorded moves.
+
+    Args:
+        paddle (Sprite): the paddle being controlled.
+        moves (Sequence[float]): How far the paddle moved on each tick,
+            negative values being up. The paddle stands still once the
+            moves run out.
+
+    Attributes:
+        tick (int): Index of the next move to replay.
+    """
+
+    def __init__(self, paddle, moves):
+        super().__init__(paddle)
+        self.moves = moves
+        self.tick = 0
+
+    def snapshot(self):
+        return (super().snapshot(), self.tick)
+
+    def restore(self, state):
+        base, self.tick = state
+        super().restore(base)
+
+    def update(self):
+        """Sets the movement of a paddle to the next recorded move."""
+        amount = self.moves[self.tick] if self.tick < len(self.moves) else 0
+        self.tick += 1
+        self.moveup = amount < 0
+        self.movedown = amount > 0
+        self.move(abs(amount))
+
+
 class PaddleMovementManager_AI(PaddleMovementManager):
     """Controls paddle movement based on heuristics
     
     Args:
         paddle (Sprite): the paddle being controlled.
-        type (str): "basic" or "advanced"
+        type (str): "basic" or "advanced", see `TYPES`.
+        rng (Random): Random number generator for the offset. Defaults
+            to the `random` module.
+
+    Raises:
+        ValueError: If `type` is not one of `TYPES`.
 
     Attributes:
         target_y (float): The y value that the paddle has determined
@@ -80,20 +242,55 @@ class PaddleMovementManager_AI(PaddleMovementManager):
             the ball is launched.
     """
 
-    def __init__(self, paddle, type):
+    # The method that sets target_y for every type of AI
+    TYPES = {"basic": "basic_target_y", "advanced": "advanced_target_y"}
+
+    def __init__(self, paddle, type, rng=None):
         super().__init__(paddle)
+        if type not in PaddleMovementManager_AI.TYPES:
+            raise ValueError(
+                f"unknown AI type {type!r}, choose from "
+                + ", ".join(PaddleMovementManager_AI.TYPES)
+            )
+        self.type = type
+        self.rng = rng if rng is not None else random
         self.target_y = None
         self.offset = 0
+        self.predictor = TrajectoryPredictor(paddle.area.height)
+        self.set_target_y = getattr(self, PaddleMovementManager_AI.TYPES[type])
+
+    def snapshot(self):
+        # The shared generator of the random module isn't the manager's to rewind
+        rng_state = self.rng.getstate() if self.rng is not random else None
+        return (super().snapshot(), self.target_y, self.offset, rng_state)
 
-        if type == "basic":
-            self.set_target_y = self.basic_target_y
-        elif type == "advanced":
-            self.set_target_y = self.advanced_target_y
+    def restore(self, state):
+        base, self.target_y, self.offset, rng_state = state
+        if rng_state is not None:
+            self.rng.setstate(rng_state)
+        super().restore(base)
+
+    def threat_ball(self):
+        """Return the ball this paddle should go for.
+
+        With a single ball that is the ball. Otherwise the balls are
+        looked up in the game's grid, see `broadphase.threat_ball`.
+        """
+        game = self.paddle.game
+        grid = game.grids.get("ballsprite")
+        if grid is None:
+            # Cheaper than iterating the group, which goes through sprites() too
+            balls = game.spritegroups["ballsprite"].sprites()
+            return balls[0] if balls else None
+        return threat_ball(grid, self.paddle)
 
     def basic_target_y(self):
         """Paddle follows the ball."""
-        ball = self.paddle.game.spritegroups["ballsprite"].sprite
-        self.target_y = ball.rect.centery
+        ball = self.threat_ball()
+        # The centers are worked out here instead of through the `Body`
+        # properties, since this runs for every paddle on every tick
+        body = self.paddle.body if ball is None else ball.body
+        self.target_y = body.y + body.height / 2
 
     def advanced_target_y(self):
         """Determine the final location of the ball depending on angle and distance from paddle.
@@ -102,62 +299,185 @@ class PaddleMovementManager_AI(PaddleMovementManager):
         the height of the paddle) in order to add some variance to the angle at
         which it launches the ball (otherwise it would always launch ball at an
         angle of 0 or π).
-        """
-        screen_height = pygame.display.get_surface().get_height()
-        ball = self.paddle.game.spritegroups["ballsprite"].sprite
 
-        angle = ball.angle
-        if angle < 0:
-            angle = 2 * math.pi + ball.angle
+        The intercept is computed by a `TrajectoryPredictor`, so it is only
+        recalculated when the ball changes direction.
+        """
+        ball = self.threat_ball()
 
-        ball_direction = (
-            "left" if angle > 0.5 * math.pi and angle < 1.5 * math.pi else "right"
-        )
-        if ball_direction == "left":
+        if ball is not None and self.predictor.heading(ball) == self.paddle.side:
+            # Where the ball's center is when it touches the paddle
+            body = self.paddle.body
             if self.paddle.side == "left":
-                angle = math.pi - angle
-                dx = ball.rect.centerx - self.paddle.rect.right
-                dy = dx * math.tan(angle)
-                self.target_y = math.pow(
-                    -1, abs(ball.rect.centery - dy) // screen_height
-                ) * (abs(ball.rect.centery - dy) % screen_height)
-                if self.target_y < 0:
-                    self.target_y = screen_height + self.target_y
-                if self.offset == 0:
-                    self.offset = random.uniform(
-                        -self.paddle.rect.height / 2, self.paddle.rect.height / 2
-                    )
-                self.target_y = self.target_y + self.offset
+                x = body.x + body.width + ball.body.width / 2
             else:
-                self.target_y = screen_height / 2
-                self.offset = 0
+                x = body.x - ball.body.width / 2
+            if self.offset == 0:
+                self.offset = self.rng.uniform(-body.height / 2, body.height / 2)
+            self.target_y = self.predictor.intercept_y(ball, x) + self.offset
         else:
-            if self.paddle.side == "right":
-                dx = self.paddle.rect.left - ball.rect.centerx
-                dy = dx * math.tan(angle)
-                self.target_y = math.pow(
-                    -1, abs(ball.rect.centery - dy) // screen_height
-                ) * (abs(ball.rect.centery - dy) % screen_height)
-                if self.target_y < 0:
-                    self.target_y = screen_height + self.target_y
-                if self.offset == 0:
-                    self.offset = random.uniform(
-                        -self.paddle.rect.height / 2, self.paddle.rect.height / 2
-                    )
-            else:
-                self.target_y = screen_height / 2
-                self.offset = 0
+            self.target_y = self.paddle.area.height / 2
+            self.offset = 0
 
     def update(self):
         """Sets the movement direction of a paddle based on target_y."""
         self.set_target_y()
 
-        distance = abs(self.target_y - self.paddle.rect.centery)
-        if self.target_y > self.paddle.rect.centery:
+        body = self.paddle.body
+        centery = body.y + body.height / 2
+        target_y = self.target_y
+        if target_y > centery:
             self.moveup = False
             self.movedown = True
-        if self.target_y < self.paddle.rect.centery:
+        if target_y < centery:
             self.moveup = True
             self.movedown = False
 
-        self.move(distance)
+        self.move(abs(target_y - centery))
+
+
+class PaddleMovementManager_Search(PaddleMovementManager_AI):
+    """Controls paddle movement by searching for the best place to hit the ball.
+
+    Where the ball hits the paddle decides the angle it leaves at. For a
+    number of candidate hit locations the ball's flight back across the
+    field is simulated with the trajectory model, and the location that
+    leaves the opposing paddles the furthest out of reach is aimed for.
+
+    The search is anytime: candidates are evaluated coarse to fine until
+    the time budget of the tick runs out, and resumed on the next tick.
+    Results are kept for as long as the ball stays on the same segment of
+    its trajectory, so a search is done at most once per segment. A full
+    search normally takes a small fraction of the budget; only when it
+    doesn't finish in one tick do results depend on timing, which makes
+    the match no longer reproducible from its seed.
+
+    Args:
+        paddle (Sprite): the paddle being controlled.
+        budget (float): Seconds the search may take per tick.
+        resolution (int): Number of hit locations tried across the paddle.
+
+    Attributes:
+        best_score (float): How far out of reach the best candidate so far
+            leaves the opponent, in pixels. Positive means it can't reach
+            the ball in time.
+        evaluations (int): Number of candidates evaluated in total.
+    """
+
+    # Hit locations too close to the ends of the paddle are not aimed
+    # for, since the ball could just miss it
+    EDGE = 0.1
+
+    def __init__(self, paddle, budget=0.002, resolution=33):
+        super().__init__(paddle, "advanced")
+        self.type = "search"
+        self.budget = budget
+        self.set_target_y = self.search_target_y
+        self.evaluations = 0
+        self.best_score = -math.inf
+
+        # Coarse to fine: both ends and the middle first, then halfway
+        # between every pair of those, and so on
+        order = []
+        step = resolution - 1
+        while step:
+            for i in range(0, resolution, step):
+                if i not in order:
+                    order.append(i)
+            step //= 2
+        span = 1 - 2 * PaddleMovementManager_Search.EDGE
+        self.locations = [
+            PaddleMovementManager_Search.EDGE + span * i / (resolution - 1) for i in order
+        ]
+        self._trajectory = None
+        self._next = 0
+        self._best_offset = 0
+
+    def snapshot(self):
+        return (
+            super().snapshot(),
+            self._trajectory,
+            self._next,
+            self._best_offset,
+            self.best_score,
+        )
+
+    def restore(self, state):
+        base, self._trajectory, self._next, self._best_offset, self.best_score = state
+        super().restore(base)
+
+    def opponents(self):
+        """Return the paddles on the other side."""
+        return [
+            paddle
+            for paddle in self.paddle.game.spritegroups["paddlesprites"]
+            if paddle.side != self.paddle.side
+        ]
+
+    def _face_x(self, paddle, ball):
+        # Where the ball's center is when it touches the paddle
+        body = paddle.body
+        if paddle.side == "left":
+            return body.x + body.width + ball.body.width / 2
+        return body.x - ball.body.width / 2
+
+    def search_target_y(self):
+        """Aim for the hit location that is hardest to return.
+
+        Candidates the paddle can't reach before the ball arrives are
+        skipped. Until one is found the paddle aims for the middle of
+        the paddle like the advanced AI.
+        """
+        ball = self.threat_ball()
+        if ball is None or self.predictor.heading(ball) != self.paddle.side:
+            self.target_y = self.paddle.area.height / 2
+            self._trajectory = None
+            return
+
+        paddle = self.paddle
+        x = self._face_x(paddle, ball)
+        intercept = self.predictor.intercept_y(ball, x)
+        if ball.trajectory is not self._trajectory:
+            self._trajectory = ball.trajectory
+            self._next = 0
+            self._best_offset = 0
+            self.best_score = -math.inf
+        if self._next < len(self.locations):
+            self._search(ball, x, intercept)
+        self.target_y = intercept + self._best_offset
+
+    def _search(self, ball, x, intercept):
+        paddle = self.paddle
+        body = paddle.body
+        deadline = perf_counter() + self.budget
+        ticks = max((x - ball.body.centerx) / ball.velocity[0], 0)
+        reach = ticks * paddle.speed
+        speed = ball.speed + 1 if ball.speed < ball.maxspeed else ball.speed
+        opponents = [
+            (opponent, self._face_x(opponent, ball)) for opponent in self.opponents()
+        ]
+        locations = self.locations
+        while self._next < len(locations):
+            location = locations[self._next]
+            self._next += 1
+            self.evaluations += 1
+            # The paddle has to be placed so the ball hits it at `location`
+            offset = (0.5 - location) * body.height
+            if abs(intercept + offset - body.centery) <= reach:
+                angle = Ball.rebound_angle(paddle.side, location)
+                velocity_x = abs(speed * math.cos(angle))
+                score = math.inf
+                for opponent, opponent_x in opponents:
+                    y = self.predictor.project(x, intercept, angle, opponent_x)
+                    flight = abs(opponent_x - x) / velocity_x
+                    # Distance the opponent has to cover to get any part
+                    # of itself in front of the ball, less what it can
+                    distance = abs(y - opponent.body.centery) - (
+                        opponent.body.height + ball.body.height
+                    ) / 2
+                    score = min(score, distance - (ticks + flight) * opponent.speed)
+                if score > self.best_score:
+                    self.best_score = score
+                    self._best_offset = offset
+            if perf_counter() > deadline:
+                break
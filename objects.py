@@ -2,40 +2,109 @@ import math
 import pygame
 import random
 from colors import *
+from text_cache import text_cache
 from pygame.locals import *
 
 
+class Body:
+    """The position and size of a sprite in float coordinates.
+
+    Sprites move by fractions of a pixel, which a `Rect` can't hold
+    because it truncates or rounds every coordinate to an integer.
+    Physics and the AI work on the body, and the sprite's `rect` is only
+    derived from it when something needs whole pixels, like drawing.
+
+    Args:
+        x, y (float): Top left corner.
+        width, height (float)
+    """
+
+    __slots__ = ("x", "y", "width", "height")
+
+    def __init__(self, x, y, width, height):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+    @property
+    def centerx(self):
+        return self.x + self.width / 2
+
+    @property
+    def centery(self):
+        return self.y + self.height / 2
+
+    def sync(self, rect):
+        """Move `rect` to the nearest whole pixel and return it."""
+        rect.x = round(self.x)
+        rect.y = round(self.y)
+        return rect
+
+
 class Ball(pygame.sprite.Sprite):
     """A ball that will move across the screen.
 
     Args:
         speed (int or float): The initial speed of the ball.
+        maxspeed (int or float): The speed the ball can not exceed.
+        area (Rect): The area that the ball must stay inside. Defaults
+            to the rect of the display surface.
+        rng (Random): Random number generator for the launch angles.
+            Defaults to the `random` module.
+        image (Surface): The image of the ball, e.g. from an `Atlas`.
+            Defaults to a white ball drawn on a new surface.
     
     Attributes:
         image (Surface): The Surface object that represents the ball.
-        rect (Rect): The position and size of the ball.
+        body (Body): The exact position and size of the ball.
+        rect (Rect): The position and size of the ball rounded to whole
+            pixels. Assigning a rect moves the body to it.
         area (Rect): The area that the ball must stay inside.
         initial_speed (int or float): The initial speed of the ball.
         speed (int or float): The current speed of the ball.
         angle (float): The angle at which the ball is moving, in radians.
+        hits (int): How many times the ball has hit a paddle.
+        trajectory ((float, float, float, float)): Center, angle and speed of
+            the ball at the start of the current straight segment of its
+            path. It is replaced whenever the ball changes direction, so
+            anything cached per segment can compare it by identity.
+        velocity ((float, float)): Distance moved per tick along x and y
+            on the current segment.
+        grid (UniformGrid): The grid the ball is tracked in, if any.
     """
 
     WIDTH = 16
     HEIGHT = 16
+    MAX_BOUNCES = 8
 
-    def __init__(self, speed, maxspeed):
+    def __init__(self, speed, maxspeed, area=None, rng=None, image=None):
         pygame.sprite.Sprite.__init__(self)
         # self.image, self.rect = load_image('ball.png', -1)
-        self.image = pygame.Surface((Ball.WIDTH, Ball.HEIGHT))
-        self.rect = self.image.get_rect()
-        pygame.draw.circle(self.image, WHITE, self.rect.center, Ball.WIDTH / 2)
-        screen = pygame.display.get_surface()
-        self.area = screen.get_rect()
-        self.rect.center = self.area.center
+        if image is None:
+            image = pygame.Surface((Ball.WIDTH, Ball.HEIGHT))
+            Ball.draw(image, WHITE)
+        self.image = image
+        self._rect = pygame.Rect(0, 0, Ball.WIDTH, Ball.HEIGHT)
+        if area is None:
+            area = pygame.display.get_surface().get_rect()
+        self.area = area
+        self.rng = rng if rng is not None else random
+        self.body = Body(0, 0, Ball.WIDTH, Ball.HEIGHT)
+        self._center()
         self.initial_speed = speed
         self.maxspeed = maxspeed
         self.speed = speed
         self.angle = self._random_angle()
+        self.hits = 0
+        self.grid = None
+        self.new_trajectory()
+
+    @staticmethod
+    def draw(surface, color):
+        """Draw the ball filling `surface`."""
+        rect = surface.get_rect()
+        pygame.draw.circle(surface, color, rect.center, rect.width / 2)
 
     def _random_angle(self):
         """Return a random angle (in radians) between 0.15π and 0.3π
@@ -43,7 +112,21 @@ class Ball(pygame.sprite.Sprite):
         Returns:
             float: The random angle.
         """
-        return math.pi * random.uniform(0.15, 0.3)
+        return math.pi * self.rng.uniform(0.15, 0.3)
+
+    @property
+    def rect(self):
+        return self.body.sync(self._rect)
+
+    @rect.setter
+    def rect(self, rect):
+        self.body.x = rect.x
+        self.body.y = rect.y
+
+    def _center(self):
+        body = self.body
+        body.x = self.area.centerx - body.width / 2
+        body.y = self.area.centery - body.height / 2
 
     def reinit(self):
         """Resets the ball to center of screen, initial speed, moving at a random angle.
@@ -52,46 +135,199 @@ class Ball(pygame.sprite.Sprite):
         or at the beginning of a new game.
         """
         self.angle = self._random_angle()
-        self.rect.center = self.area.center
+        self._center()
         self.speed = self.initial_speed
+        self.new_trajectory()
+
+    def new_trajectory(self):
+        """Start a new segment of the ball's trajectory at its current position."""
+        body = self.body
+        self.trajectory = (body.centerx, body.centery, self.angle, self.speed)
+        self.velocity = (
+            self.speed * math.cos(self.angle),
+            -(self.speed * math.sin(self.angle)),
+        )
 
     def update(self):
         """Move the ball based on its current angle and speed.
         
+        The path of the ball during the tick is swept instead of only
+        testing where it ends up, so a fast ball can't skip through
+        paddles or walls. The ball is moved to the earliest impact on its
+        path, bounces, and travels the rest of the tick in its new
+        direction, up to `MAX_BOUNCES` times per tick.
+
         Changes angle of the ball based on what part of the paddle it
         collides with. This method also resets the ball if it collides
         with the left or right side of the screen
         """
-        newpos = self.calcnewpos(self.rect, self.speed, self.angle)
-        self.rect = newpos
+        body = self.body
+        x = body.x
+        y = body.y
+        remaining = 1.0
+        for _ in range(Ball.MAX_BOUNCES):
+            vx, vy = self.velocity
+            time, impact = self.next_impact(x, y, vx, vy, remaining)
+            if impact is None:
+                body.x = x + vx * remaining
+                body.y = y + vy * remaining
+                break
+            x += vx * time
+            y += vy * time
+            remaining -= time
+            body.x = x
+            body.y = y
 
-        if not self.area.contains(newpos):
-            if newpos.top <= 0 or newpos.bottom >= self.area.height:
+            if impact == "wall":
                 self.angle = -self.angle
-            if newpos.left <= 0:
+                self.new_trajectory()
+            elif impact == "left":
                 self.game.state.player1_scored()
                 self.reinit()
-            if newpos.right >= self.area.width:
+                break
+            elif impact == "right":
                 self.game.state.player2_scored()
                 self.reinit()
+                break
+            else:
+                self.hit(impact, y + body.height / 2)
+        # If the ball bounced MAX_BOUNCES times it stays at the last impact
+
+        if self.grid is not None:
+            self.grid.move(self)
+
+    def next_impact(self, x, y, vx, vy, remaining):
+        """Find the first thing the ball runs into within `remaining` of a tick.
+
+        Args:
+            x, y (float): Top left corner of the ball.
+            vx, vy (float): Velocity of the ball per tick.
+            remaining (float): Part of the tick left to travel.
+
+        Returns:
+            (float, object): The time of impact and "wall", "left" or
+            "right" for walls and goals, or the paddle that was hit.
+            The impact is None if the ball moves freely.
+        """
+        area = self.area
+        width = self.body.width
+        height = self.body.height
+        first_time = remaining
+        first = None
+
+        if vy < 0:
+            time = (area.top - y) / vy
+        elif vy > 0:
+            time = (area.bottom - height - y) / vy
+        else:
+            time = math.inf
+        if time <= first_time:
+            first_time, first = max(time, 0), "wall"
+
+        if vx < 0:
+            time, goal = (area.left - x) / vx, "left"
+        elif vx > 0:
+            time, goal = (area.right - width - x) / vx, "right"
         else:
-            for paddle in pygame.sprite.spritecollide(
-                self, self.game.spritegroups["paddlesprites"], False
-            ):
-                if self.speed < self.maxspeed:
-                    self.speed += 1
-                collision_location = (self.rect.centery - paddle.rect.top) / (
-                    paddle.rect.bottom - paddle.rect.top
-                )
-                if paddle.side == "left":
-                    self.angle = (collision_location * -0.5 + 0.25) * math.pi
-                if paddle.side == "right":
-                    self.angle = (collision_location * 0.5 + 0.75) * math.pi
-
-    def calcnewpos(self, rect, speed, angle):
-        """Calculates the new position of the rect based on speed and angle."""
-        dx, dy = speed * math.cos(angle), -(speed * math.sin(angle))
-        return rect.move(dx, dy)
+            time, goal = math.inf, None
+        if time <= first_time:
+            first_time, first = max(time, 0), goal
+
+        for paddle in self.paddles_near(x, y, vx * remaining, vy * remaining):
+            # Only the faces a paddle hits the ball back with count, so a
+            # ball moving away from a paddle passes through it
+            if (vx < 0) != (paddle.side == "left"):
+                continue
+            time = self.time_of_impact(x, y, vx, vy, paddle.body)
+            if time is not None and time < first_time:
+                first_time, first = time, paddle
+
+        return first_time, first
+
+    def time_of_impact(self, x, y, vx, vy, body):
+        """Return when the ball starts overlapping `body`, or None if it doesn't.
+
+        The ball's body is swept from (x, y) along (vx, vy) per tick. If
+        it already overlaps `body` the time of impact is 0.
+        """
+        left = body.x - self.body.width
+        right = body.x + body.width
+        top = body.y - self.body.height
+        bottom = body.y + body.height
+
+        if vx:
+            enter_x, exit_x = (left - x) / vx, (right - x) / vx
+            if enter_x > exit_x:
+                enter_x, exit_x = exit_x, enter_x
+        elif left < x < right:
+            enter_x, exit_x = -math.inf, math.inf
+        else:
+            return None
+        if vy:
+            enter_y, exit_y = (top - y) / vy, (bottom - y) / vy
+            if enter_y > exit_y:
+                enter_y, exit_y = exit_y, enter_y
+        elif top < y < bottom:
+            enter_y, exit_y = -math.inf, math.inf
+        else:
+            return None
+
+        enter = max(enter_x, enter_y)
+        leave = min(exit_x, exit_y)
+        if enter >= leave or leave <= 0:
+            return None
+        return max(enter, 0)
+
+    def paddles_near(self, x, y, dx, dy):
+        """Return the paddles that could be hit moving by (dx, dy) from (x, y).
+
+        If the paddles are tracked in a grid only the paddles in the
+        cells the swept path overlaps are returned.
+        """
+        grid = self.game.grids.get("paddlesprites")
+        if grid is None:
+            return self.game.spritegroups["paddlesprites"]
+        # Padded by a pixel on every side, since the paddles are filed
+        # in the grid by their rounded rects
+        left = int(min(x, x + dx)) - 1
+        top = int(min(y, y + dy)) - 1
+        swept = pygame.Rect(
+            left, top, abs(dx) + self.body.width + 3, abs(dy) + self.body.height + 3
+        )
+        return grid.query(swept)
+
+    def hit(self, paddle, centery):
+        """Bounce off a paddle.
+
+        The ball speeds up and leaves at an angle that depends on where
+        on the paddle it hit.
+
+        Args:
+            paddle (Paddle)
+            centery (float): The y of the ball's center at the impact.
+        """
+        self.hits += 1
+        if self.speed < self.maxspeed:
+            self.speed += 1
+        collision_location = (centery - paddle.body.y) / paddle.body.height
+        self.angle = Ball.rebound_angle(paddle.side, collision_location)
+        self.new_trajectory()
+
+    @staticmethod
+    def rebound_angle(side, collision_location):
+        """Return the angle the ball leaves a paddle at.
+
+        Args:
+            side (str): The side of the paddle, "left" or "right".
+            collision_location (float): Where the ball's center hit the
+                paddle, from 0 at its top to 1 at its bottom.
+
+        Returns:
+            float: The angle in radians.
+        """
+        if side == "left":
+            return (collision_location * -0.5 + 0.25) * math.pi
+        return (collision_location * 0.5 + 0.75) * math.pi
 
 
 class Paddle(pygame.sprite.Sprite):
@@ -99,112 +335,176 @@ class Paddle(pygame.sprite.Sprite):
     
     Args:
         side (str): "left" or "right"
+        area (Rect): The area that the paddle must stay inside. Defaults
+            to the rect of the display surface.
+        inset (int): Distance between the paddle and its side of the area.
+        speed (int or float): Distance the paddle moves per tick.
+        width (int): Defaults to `WIDTH`.
+        height (int): Defaults to `HEIGHT`.
+        image (Surface): The image of the paddle, e.g. from an `Atlas`.
+            Defaults to a white paddle drawn on a new surface.
 
     Attributes:
         image (Surface): The Surface object that represents the paddle.
-        rect (Rect): The position and size of the paddle.
+        body (Body): The exact position and size of the paddle.
+        rect (Rect): The position and size of the paddle rounded to whole
+            pixels. Assigning a rect moves the body to it.
         area (Rect): The area that the paddle must stay inside.
         side (str): "left" or "right"
         speed (int or float): Speed of the paddle.
         state (str): "still", "moveup" or "movedown"
         movepos([int or float, int or float]): How much to move in each direction
-            each frame
+            each frame. Moves are multiples of 1 / `SUBPIXELS`, so a speed
+            that isn't is rounded down to one.
+        grid (UniformGrid): The grid the paddle is tracked in, if any.
     """
 
     WIDTH = 16
     HEIGHT = 100
+    # Moves are rounded down to a fraction of a pixel, so they
+    # add up exactly and can be recorded as integers
+    SUBPIXELS = 256
 
-    def __init__(self, side):
+    def __init__(
+        self, side, area=None, inset=0, speed=5, width=WIDTH, height=HEIGHT, image=None
+    ):
         pygame.sprite.Sprite.__init__(self)
-        self.image = pygame.Surface((Paddle.WIDTH, Paddle.HEIGHT))
-        self.rect = self.image.get_rect()
-        pygame.draw.rect(self.image, WHITE, self.rect)
-        screen = pygame.display.get_surface()
-        self.area = screen.get_rect()
+        if image is None:
+            image = pygame.Surface((width, height))
+            Paddle.draw(image, WHITE)
+        self.image = image
+        self._rect = pygame.Rect(0, 0, width, height)
+        if area is None:
+            area = pygame.display.get_surface().get_rect()
+        self.area = area
+        self.body = Body(0, 0, width, height)
         self.side = side
-        self.speed = 5
+        self.inset = inset
+        self.grid = None
+        self.speed = speed
         self.state = "still"
         self.reinit()
 
+    @staticmethod
+    def draw(surface, color):
+        """Draw the paddle filling `surface`."""
+        surface.fill(color)
+
+    @property
+    def rect(self):
+        return self.body.sync(self._rect)
+
+    @rect.setter
+    def rect(self, rect):
+        self.body.x = rect.x
+        self.body.y = rect.y
+
     def reinit(self):
         """Reset paddles to initial state."""
         self.state = "still"
         self.movepos = [0, 0]
+        body = self.body
         if self.side == "left":
-            self.rect.midleft = self.area.midleft
+            body.x = self.area.left + self.inset
         if self.side == "right":
-            self.rect.midright = self.area.midright
+            body.x = self.area.right - body.width - self.inset
+        body.y = self.area.centery - body.height / 2
+        if self.grid is not None:
+            self.grid.move(self)
 
     def update(self):
         """Move paddles based on current state and speed."""
-        newpos = self.rect.move(self.movepos)
-        if self.area.contains(newpos):
-            self.rect = newpos
+        dx, dy = self.movepos
+        if not dx and not dy:
+            return
+        body = self.body
+        area = self.area
+        x = body.x + dx
+        y = body.y + dy
+        if (
+            area.left <= x
+            and x + body.width <= area.right
+            and area.top <= y
+            and y + body.height <= area.bottom
+        ):
+            body.x = x
+            body.y = y
+            if self.grid is not None:
+                self.grid.move(self)
 
     def moveup(self, custom_amount=None):
         """Make paddle start moving up."""
-        if custom_amount is not None and custom_amount < self.speed:
-            self.movepos[1] = -custom_amount
-        else:
-            self.movepos[1] = -self.speed
+        if custom_amount is None or custom_amount > self.speed:
+            custom_amount = self.speed
+        self.movepos[1] = -math.floor(custom_amount * Paddle.SUBPIXELS) / Paddle.SUBPIXELS
 
     def movedown(self, custom_amount=None):
         """Make paddle start moving down."""
-        if custom_amount is not None and custom_amount < self.speed:
-            self.movepos[1] = custom_amount
-        else:
-            self.movepos[1] = self.speed
+        if custom_amount is None or custom_amount > self.speed:
+            custom_amount = self.speed
+        self.movepos[1] = math.floor(custom_amount * Paddle.SUBPIXELS) / Paddle.SUBPIXELS
 
     def stop(self):
         """Stop paddle movement."""
         self.movepos = [0, 0]
 
 
-class Player1Score(pygame.sprite.Sprite):
-    """A sprite that shows player 1's score
-    
-    Attributes:
-        font (Font): The font family and size to display score with
-        image (Surface): The Surface object that represents the score sprite.
-        rect (Rect): The position and size of the score sprite.
-    """
-
-    def __init__(self):
-        pygame.sprite.Sprite.__init__(self)
-        self.font = pygame.font.Font(None, 48)
-        self.image = self.font.render(str(0), 1, WHITE)
-        self.rect = self.image.get_rect()
-        self.rect.top = 10
-        self.rect.left = pygame.display.get_surface().get_rect().centerx + 10
+class Score(pygame.sprite.Sprite):
+    """A sprite that shows a player's score
 
-    def update(self):
-        """Update score text based on current game state."""
-        self.image = self.font.render(str(self.game.state.player1_score), 1, WHITE)
-        self.rect = self.image.get_rect()
-        self.rect.top = 10
-        self.rect.left = pygame.display.get_surface().get_rect().centerx + 10
+    The text is only rendered again when the game state reports that
+    the scores changed, and rendered digits are shared through
+    `text_cache`.
 
+    Args:
+        player (int): 1 or 2. Player 1's score is shown right of the
+            center line and player 2's left of it.
+        area (Rect): The area the score is shown in. Defaults to the rect
+            of the display surface.
+        color (Color or (int, int, int)): Color of the text.
 
-class Player2Score(pygame.sprite.Sprite):
-    """A sprite that shows player 2's score
-        
     Attributes:
         font (Font): The font family and size to display score with
         image (Surface): The Surface object that represents the score sprite.
         rect (Rect): The position and size of the score sprite.
+        revision (int): The revision of the game state last rendered.
     """
 
-    def __init__(self):
+    FONT_SIZE = 48
+
+    def __init__(self, player, area=None, color=WHITE):
         pygame.sprite.Sprite.__init__(self)
-        self.font = pygame.font.Font(None, 48)
-        self.image = self.font.render(str(0), 1, WHITE)
+        if area is None:
+            area = pygame.display.get_surface().get_rect()
+        self.area = area
+        self.player = player
+        self.color = color
+        self.font = text_cache.font(None, Score.FONT_SIZE)
+        self.revision = None
+        self.render(0)
+
+    def render(self, score):
+        """Show `score` and place the text next to the center line."""
+        self.text = str(score)
+        self.image = text_cache.render(self.font, self.text, self.color)
         self.rect = self.image.get_rect()
         self.rect.top = 10
-        self.rect.right = pygame.display.get_surface().get_rect().centerx - 10
+        if self.player == 1:
+            self.rect.left = self.area.centerx + 10
+        else:
+            self.rect.right = self.area.centerx - 10
+
+    def scaled_image(self, scale):
+        """Return the text rendered at `scale`, so it stays sharp at any resolution."""
+        font = text_cache.font(None, round(Score.FONT_SIZE * scale))
+        return text_cache.render(font, self.text, self.color)
 
     def update(self):
-        """Update score text based on current game state."""
-        self.image = self.font.render(str(self.game.state.player2_score), 1, WHITE)
-        self.rect = self.image.get_rect()
-        self.rect.top = 10
-        self.rect.right = pygame.display.get_surface().get_rect().centerx - 10
+        """Update score text if the game state changed."""
+        state = self.game.state
+        if state.revision != self.revision:
+            self.revision = state.revision
+            if self.player == 1:
+                self.render(state.player1_score)
+            else:
+                self.render(state.player2_score)
@@ -0,0 +1,292 @@
+"""
+Pipelined game loop.
+
+The simulation runs on a worker thread while the main thread handles
+events and renders, so a slow movement manager (such as the search AI)
+or a heavy telemetry sink delays the next tick instead of the next
+frame. The state is double buffered: the worker steps the live game and
+publishes an immutable `snapshot.Snapshot` of it after every tick, and
+the renderer draws the most recently published one while the next is
+being simulated. Publishing is a single assignment, so the two threads
+never wait on a lock.
+
+Everything that makes decisions (movement managers, including the AI,
+physics and listeners) runs on the worker in the same order as in the
+serial loop, so matches play out exactly as they would there. pygame's
+display and event functions are only called from the main thread.
+
+Python threads share one interpreter lock, so the worker and the
+renderer still take turns: the gain is that a frame no longer has to
+wait for a whole tick, and pygame releases the lock while it blits,
+scales and presents. The price is latency: a frame shows the state of
+the last finished tick, and with interpolation one tick before that.
+
+Usage: python pipeline.py [seconds]
+    Plays a scripted keyboard player against the search AI with the
+    serial and the pipelined loop and compares frame times and input
+    latency.
+"""
+
+import pygame
+import sys
+import threading
+import time
+from profiler import FrameProfiler
+from time import perf_counter
+
+
+class Pipeline:
+    """Runs the simulation of a game on a worker thread while the main thread renders.
+
+    Args:
+        game (Game): A game with a display. Whether frames are
+            interpolated is taken from it.
+        switch_interval (float): How often in seconds Python makes a
+            thread holding the interpreter lock let others run, while the
+            pipeline runs. Python's default of 5 ms lets a busy worker hold
+            up a frame for most of its budget.
+
+    Attributes:
+        front ((Snapshot, Snapshot, float)): The most recently published
+            state, the state a tick before it and the time it was published.
+        frames (int): Number of frames rendered.
+        tick_profiler (FrameProfiler): Measures every tick and its phases
+            on the worker, if the game has a profiler. The game's profiler
+            then only measures the frames of the main thread, since the
+            threads would otherwise charge each other's time.
+    """
+
+    def __init__(self, game, switch_interval=0.001):
+        self.game = game
+        self.switch_interval = switch_interval
+        self.front = None
+        self.frames = 0
+        self.tick_profiler = None
+        if game.profiler is not None:
+            self.tick_profiler = FrameProfiler(
+                budget=1 / game.tick_rate, window=game.profiler.frame_times.maxlen
+            )
+        self._done = threading.Event()
+        self._published = threading.Event()
+        self._error = None
+        self._hud = None
+        self._scores = {}
+
+    def simulate(self, max_score=None, max_ticks=None):
+        """Step the game in real time and publish its state after every tick.
+
+        Runs on the worker thread until the match is over or the
+        pipeline is stopped.
+        """
+        game = self.game
+        tick_length = 1 / game.tick_rate
+        try:
+            current = game.snapshot()
+            self.front = (current, current, perf_counter())
+            next_tick = perf_counter()
+            while not self._done.is_set() and not game.finished(max_score, max_ticks):
+                now = perf_counter()
+                if now < next_tick:
+                    # Sleeping lets the renderer run
+                    time.sleep(next_tick - now)
+                    continue
+                # Don't try to catch up after a stall, as the serial loop
+                if now - next_tick > 0.25:
+                    next_tick = now
+                tick_profiler = self.tick_profiler
+                if tick_profiler is None:
+                    game.step()
+                else:
+                    tick_profiler.begin_frame()
+                    game.step(tick_profiler)
+                    tick_profiler.end_frame()
+                previous, current = current, game.snapshot()
+                self.front = (previous, current, perf_counter())
+                self._published.set()
+                next_tick += tick_length
+        except BaseException as error:
+            self._error = error
+        finally:
+            self._done.set()
+            self._published.set()
+
+    def drawables(self, front, now):
+        """Yield what to draw for a published state, see `Game.drawables`."""
+        game = self.game
+        previous, current, published = front
+        alpha = None
+        if game.interpolate:
+            alpha = min((now - published) * game.tick_rate, 1)
+
+        width, height = game.area.size
+        groups = game.spritegroups
+        for name, states, previous_states in (
+            ("paddlesprites", current.paddles, previous.paddles),
+            ("ballsprite", current.balls, previous.balls),
+        ):
+            group = groups.get(name)
+            if group is None:
+                continue
+            for sprite, state, previous_state in zip(
+                group.sprites(), states, previous_states
+            ):
+                x, y = state.x, state.y
+                if alpha is not None:
+                    dx = x - previous_state.x
+                    dy = y - previous_state.y
+                    # Jumps such as a goal aren't interpolated, as in
+                    # `Game.interpolated_rect`
+                    if abs(dx) < width / 4 and abs(dy) < height / 4:
+                        x = previous_state.x + dx * alpha
+                        y = previous_state.y + dy * alpha
+                body = sprite.body
+                rect = pygame.Rect(round(x), round(y), body.width, body.height)
+                yield game.drawable(sprite, rect)
+
+        # The scores are drawn from the published state too, not the live one
+        if self._hud is not None:
+            for score in self._hud.sprites():
+                if score.player == 1:
+                    value = current.player1_score
+                else:
+                    value = current.player2_score
+                if self._scores.get(score) != value:
+                    self._scores[score] = value
+                    score.render(value)
+                yield game.drawable(score, score.rect)
+        yield from game.overlays()
+
+    def run(self, max_score=None, max_ticks=None):
+        """Run the game until the window is closed or the match is over.
+
+        Args:
+            max_score (int): Stop once either player reaches this score.
+            max_ticks (int): Stop after this many simulation steps.
+
+        Returns:
+            State: The state of the game at the end of the match.
+        """
+        game = self.game
+        if game.headless:
+            return game.run_headless(max_score, max_ticks)
+
+        # Scores are rendered from the published state by this thread, so
+        # the worker mustn't update them
+        self._hud = game.spritegroups.pop("scoresprites", None)
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(self.switch_interval)
+        game.initial_frame()
+        clock = pygame.time.Clock()
+        worker = threading.Thread(
+            target=self.simulate,
+            args=(max_score, max_ticks),
+            name="simulation",
+            daemon=True,
+        )
+        self._done.clear()
+        worker.start()
+        drawn = None
+        try:
+            while True:
+                done = self._done.is_set()
+                clock.tick(game.fps or 0)
+                if not game.interpolate and self.front is drawn and not done:
+                    # Nothing new to draw, so wait for the next tick instead
+                    # of taking turns with the worker for nothing
+                    self._published.wait(1 / game.tick_rate)
+                self._published.clear()
+                profiler = game.profiler
+                if profiler is not None:
+                    profiler.begin_frame()
+
+                # Events only reach the worker through the input dispatcher,
+                # not `Game.events`, which would be cleared by another thread
+                dispatch = game.input.dispatch
+                for event in pygame.event.get():
+                    dispatch(event)
+                if profiler is not None:
+                    profiler.mark("events")
+
+                front = self.front
+                # Without interpolation a frame only changes with the state
+                if front is not None and (game.interpolate or front is not drawn):
+                    game.render(drawables=self.drawables(front, perf_counter()))
+                    drawn = front
+                    self.frames += 1
+                if profiler is not None:
+                    profiler.end_frame()
+                # The final state is drawn before stopping
+                if done:
+                    break
+        finally:
+            self._done.set()
+            worker.join()
+            sys.setswitchinterval(switch_interval)
+            if self._hud is not None:
+                game.spritegroups["scoresprites"] = self._hud
+                self._hud = None
+        if self._error is not None:
+            raise self._error
+        return game.state
+
+
+def press_keys(key, period=30):
+    """Return a listener that holds `key` down for half of every `period` ticks."""
+
+    def listener(game):
+        if game.ticks % period == 0:
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=key))
+        elif game.ticks % period == period // 2:
+            pygame.event.post(pygame.event.Event(pygame.KEYUP, key=key))
+
+    return listener
+
+
+def measure(pipelined, seconds):
+    """Play a match for `seconds`.
+
+    Returns:
+        (dict, dict): The reports of the profiler of the frames and, when
+        pipelined, of the ticks on the worker.
+    """
+    # Imported here since main imports this module
+    from main import setup_game
+
+    game = setup_game(
+        False, "keyboard", "search", seed=0, fps=60, profiler=FrameProfiler()
+    )
+    game.add_listeners([press_keys(pygame.K_UP)])
+    max_ticks = seconds * game.tick_rate
+    tick_report = None
+    if pipelined:
+        pipeline = Pipeline(game)
+        pipeline.run(max_ticks=max_ticks)
+        tick_report = pipeline.tick_profiler.report()
+    else:
+        game.startloop(max_ticks=max_ticks)
+    report = game.profiler.report()
+    pygame.display.quit()
+    return report, tick_report
+
+
+def main():
+    seconds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    for name, pipelined in (("serial", False), ("pipelined", True)):
+        report, tick_report = measure(pipelined, seconds)
+        frame = report["frame_time_ms"]
+        latency = report["input_latency_ms"]
+        print(
+            f"{name:<10} {report['frames']} frames, {report['dropped']} dropped, "
+            f"frame time p50 {frame['p50']:.2f} p99 {frame['p99']:.2f} ms, "
+            f"input latency p50 {latency['p50']:.2f} p95 {latency['p95']:.2f} ms"
+        )
+        if tick_report is not None:
+            tick = tick_report["frame_time_ms"]
+            print(
+                f"{'':<10} {tick_report['frames']} ticks on the worker, "
+                f"tick time p50 {tick['p50']:.2f} p99 {tick['p99']:.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import atexit
+import csv
+import json
+import pygame
+from collections import deque
+from time import perf_counter
+from colors import *
+from text_cache import text_cache
+
+
+class FrameProfiler:
+    """Measures how long each phase of a frame takes.
+
+    The game calls `begin_frame`, then `mark` at the end of every phase
+    (which charges the time since the previous mark to that phase), and
+    `end_frame`. When no profiler is given to the game none of this runs.
+
+    Args:
+        budget (float): Time in seconds a frame may take before it counts
+            as dropped. Defaults to one 60 FPS frame.
+        window (int): Number of recent frames used for percentiles.
+        overlay (bool): Whether to draw the statistics on screen.
+        path (str): If given, the report is written to this file when the
+            program exits, as CSV if it ends in ".csv" and JSON otherwise.
+
+    Attributes:
+        frames (int): Number of frames measured.
+        dropped (int): Number of frames that took longer than the budget.
+        phase_totals (Dict[str, float]): Total seconds spent in each phase.
+        frame_times (deque): Durations of the most recent frames in seconds.
+        latencies (deque): The most recent input latencies in seconds,
+            see `InputDispatcher.latencies`.
+    """
+
+    OVERLAY_REFRESH = 0.5  # seconds between updates of the overlay text
+
+    def __init__(self, budget=1 / 60, window=600, overlay=False, path=None):
+        self.budget = budget
+        self.overlay = overlay
+        self.frames = 0
+        self.dropped = 0
+        self.phase_totals = {}
+        self.frame_times = deque(maxlen=window)
+        self.latencies = deque(maxlen=window)
+        self._frame_start = 0
+        self._last = 0
+        self._overlay_image = None
+        self._overlay_time = 0
+        if path is not None:
+            atexit.register(self.dump, path)
+
+    def begin_frame(self):
+        """Start measuring a frame."""
+        self._frame_start = self._last = perf_counter()
+
+    def mark(self, phase):
+        """Charge the time since the previous mark to `phase`."""
+        now = perf_counter()
+        totals = self.phase_totals
+        totals[phase] = totals.get(phase, 0) + now - self._last
+        self._last = now
+
+    def end_frame(self):
+        """Finish measuring a frame."""
+        duration = perf_counter() - self._frame_start
+        self.frames += 1
+        if duration > self.budget:
+            self.dropped += 1
+        self.frame_times.append(duration)
+
+    def record_latency(self, latency):
+        """Record the input latency of a frame in seconds."""
+        self.latencies.append(latency)
+
+    def percentiles(self, times=None):
+        """Return the p50, p95 and p99 of the recent frame times in milliseconds.
+
+        Args:
+            times (Iterable[float]): Durations in seconds to use instead
+                of the frame times.
+        """
+        times = sorted(self.frame_times if times is None else times)
+        if not times:
+            return {"p50": 0, "p95": 0, "p99": 0}
+        last = len(times) - 1
+        return {
+            "p50": times[round(last * 0.50)] * 1000,
+            "p95": times[round(last * 0.95)] * 1000,
+            "p99": times[round(last * 0.99)] * 1000,
+        }
+
+    def report(self):
+        """Summarize the measurements.
+
+        Returns:
+            dict: Number of frames and dropped frames, frame time and
+            input latency percentiles and the average milliseconds per
+            frame of each phase.
+        """
+        frames = max(self.frames, 1)
+        return {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "frame_time_ms": self.percentiles(),
+            "input_latency_ms": self.percentiles(self.latencies),
+            "phase_ms": {
+                phase: total / frames * 1000
+                for phase, total in self.phase_totals.items()
+            },
+        }
+
+    def dump(self, path):
+        """Write the report to `path` as CSV if it ends in ".csv", JSON otherwise."""
+        report = self.report()
+        if not path.endswith(".csv"):
+            with open(path, "w") as file:
+                json.dump(report, file, indent=2)
+            return
+
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["metric", "value"])
+            writer.writerow(["frames", report["frames"]])
+            writer.writerow(["dropped", report["dropped"]])
+            for name, value in report["frame_time_ms"].items():
+                writer.writerow([f"frame_time_ms.{name}", value])
+            for name, value in report["input_latency_ms"].items():
+                writer.writerow([f"input_latency_ms.{name}", value])
+            for phase, value in report["phase_ms"].items():
+                writer.writerow([f"phase_ms.{phase}", value])
+
+    def overlay_image(self):
+        """Return a surface with the current statistics, refreshed twice a second."""
+        now = perf_counter()
+        if self._overlay_image is None or now - self._overlay_time > self.OVERLAY_REFRESH:
+            self._overlay_time = now
+            font = text_cache.font(None, 18)
+            percentiles = self.percentiles()
+            lines = [
+                "p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f} ms".format(**percentiles),
+                f"dropped {self.dropped}/{self.frames}",
+            ]
+            if self.latencies:
+                lines.append(
+                    "input p50 {p50:.2f}  p95 {p95:.2f} ms".format(
+                        **self.percentiles(self.latencies)
+                    )
+                )
+            frames = max(self.frames, 1)
+            for phase, total in self.phase_totals.items():
+                lines.append(f"{phase} {total / frames * 1000:.3f} ms")
+            # The text changes every refresh, so it bypasses the text cache
+            images = [font.render(line, True, GREEN) for line in lines]
+            width = max(image.get_width() for image in images)
+            height = sum(image.get_height() for image in images)
+            surface = pygame.Surface((width, height))
+            y = 0
+            for image in images:
+                surface.blit(image, (0, y))
+                y += image.get_height()
+            self._overlay_image = surface
+        return self._overlay_image
@@ -0,0 +1,312 @@
+"""
+Compact match replays.
+
+A match is fully determined by the game's seed and how far each paddle
+moved on every tick, so that is all a replay stores. Moves are counted
+in 1 / `Paddle.SUBPIXELS` of a pixel, which every move is a multiple of.
+After a fixed size header the moves are written as zigzag varints of
+the change since the previous tick, and runs of ticks where nothing
+changed are collapsed into a single count:
+
+    header | run, delta, delta | run, delta, delta | ... | run
+
+Playback re-simulates the match headlessly with the recorded moves.
+"""
+
+import struct
+from array import array
+from main import setup_game
+from movement_managers import PaddleMovementManager_Replay
+from objects import Paddle
+
+
+MAGIC = b"PONGRPL\0"
+VERSION = 3
+HEADER = struct.Struct("<8sHqHHHBHdddHH")
+
+
+def _write_varint(buffer, value):
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data, position):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _zigzag(value):
+    return (value << 1) if value >= 0 else ((-value << 1) - 1)
+
+
+def _unzigzag(value):
+    return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+def setup_parameters(game):
+    """Return the arguments of `setup_game` that a game was set up with.
+
+    Together with the seed, tick rate and moves they are all playback
+    needs to set up the same match again.
+
+    Returns:
+        dict: The number of balls and paddles per side, the ball speed
+        and maximum speed, the paddle speed, width and height.
+
+    Raises:
+        ValueError: If the game couldn't have been set up by
+            `setup_game`, such as when its balls start at different speeds.
+    """
+    balls = game.spritegroups["ballsprite"].sprites()
+    paddles = [manager.paddle for manager in game.movement_managers]
+    ball_settings = {(ball.initial_speed, ball.maxspeed) for ball in balls}
+    paddle_settings = {
+        (paddle.speed, paddle.body.width, paddle.body.height) for paddle in paddles
+    }
+    if len(ball_settings) != 1 or len(paddle_settings) != 1 or len(paddles) % 2:
+        raise ValueError("only games set up by setup_game can be recorded")
+    ((ball_speed, ball_maxspeed),) = ball_settings
+    ((paddle_speed, paddle_width, paddle_height),) = paddle_settings
+    return {
+        "balls": len(balls),
+        "paddles_per_side": len(paddles) // 2,
+        "ball_speed": ball_speed,
+        "ball_maxspeed": ball_maxspeed,
+        "paddle_speed": paddle_speed,
+        "paddle_width": paddle_width,
+        "paddle_height": paddle_height,
+    }
+
+
+class ReplayRecorder:
+    """Records a match to a replay file while it is being played.
+
+    The recorder is added to the game as a listener and streams the moves
+    of every paddle to disk in small chunks as the match runs.
+
+    Args:
+        game (Game): The game to record. It must have an integer seed
+            and be set up by `setup_game`.
+        path (str): The file to write the replay to.
+        flush_size (int): Number of buffered bytes that triggers a write.
+
+    Attributes:
+        ticks (int): Number of ticks recorded so far.
+    """
+
+    def __init__(self, game, path, flush_size=4096):
+        if not isinstance(game.seed, int):
+            raise ValueError("only games with an integer seed can be recorded")
+        parameters = setup_parameters(game)
+        self.paddles = [manager.paddle for manager in game.movement_managers]
+        self.flush_size = flush_size
+        self.file = open(path, "wb")
+        self.file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                game.seed,
+                game.tick_rate,
+                game.area.width,
+                game.area.height,
+                len(self.paddles),
+                parameters["balls"],
+                parameters["ball_speed"],
+                parameters["ball_maxspeed"],
+                parameters["paddle_speed"],
+                parameters["paddle_width"],
+                parameters["paddle_height"],
+            )
+        )
+        self.buffer = bytearray()
+        self.previous = [0] * len(self.paddles)
+        self.run = 0
+        self.ticks = 0
+        game.add_listeners([self])
+
+    def __call__(self, game):
+        """Record the moves of the tick that just ran."""
+        self.ticks += 1
+        previous = self.previous
+        changed = False
+        for i, paddle in enumerate(self.paddles):
+            if int(paddle.movepos[1] * Paddle.SUBPIXELS) != previous[i]:
+                changed = True
+                break
+        if not changed:
+            self.run += 1
+            return
+
+        buffer = self.buffer
+        _write_varint(buffer, self.run)
+        self.run = 0
+        for i, paddle in enumerate(self.paddles):
+            move = int(paddle.movepos[1] * Paddle.SUBPIXELS)
+            _write_varint(buffer, _zigzag(move - previous[i]))
+            previous[i] = move
+        if len(buffer) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered moves to disk."""
+        self.file.write(self.buffer)
+        self.buffer.clear()
+        self.file.flush()
+
+    def close(self):
+        """Finish the replay and close the file."""
+        _write_varint(self.buffer, self.run)
+        self.run = 0
+        self.flush()
+        self.file.close()
+
+
+def load(path):
+    """Read a replay file.
+
+    Args:
+        path (str)
+
+    Returns:
+        (dict, List[array]): The header fields, and the move of every
+        tick for each paddle in pixels.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    (
+        magic,
+        version,
+        seed,
+        tick_rate,
+        width,
+        height,
+        num_paddles,
+        balls,
+        ball_speed,
+        ball_maxspeed,
+        paddle_speed,
+        paddle_width,
+        paddle_height,
+    ) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} replay")
+    header = {
+        "seed": seed,
+        "tick_rate": tick_rate,
+        "size": (width, height),
+        "balls": balls,
+        "paddles_per_side": num_paddles // 2,
+        "ball_speed": ball_speed,
+        "ball_maxspeed": ball_maxspeed,
+        "paddle_speed": paddle_speed,
+        "paddle_width": paddle_width,
+        "paddle_height": paddle_height,
+    }
+
+    moves = [array("d") for _ in range(num_paddles)]
+    current = [0] * num_paddles
+    subpixels = Paddle.SUBPIXELS
+    position = HEADER.size
+    end = len(data)
+    while position < end:
+        run, position = _read_varint(data, position)
+        for i in range(num_paddles):
+            moves[i].extend(array("d", [current[i] / subpixels]) * run)
+        if position >= end:
+            break
+        for i in range(num_paddles):
+            delta, position = _read_varint(data, position)
+            current[i] += _unzigzag(delta)
+            moves[i].append(current[i] / subpixels)
+    return header, moves
+
+
+class ReplayPlayer:
+    """Re-simulates a recorded match headlessly.
+
+    Snapshots of the simulation are taken every `snapshot_interval` ticks
+    as playback passes them, so seeking backwards only re-simulates from
+    the closest snapshot instead of from the start.
+
+    Args:
+        path (str): The replay file.
+        snapshot_interval (int): Ticks between snapshots.
+
+    Attributes:
+        game (Game): The headless game the replay is played in.
+        ball (Ball): The first ball of the game.
+        length (int): Number of recorded ticks.
+    """
+
+    def __init__(self, path, snapshot_interval=600):
+        header, moves = load(path)
+        self.header = header
+        self.length = len(moves[0]) if moves else 0
+        self.snapshot_interval = snapshot_interval
+        # Movement managers are made in the order they were recorded in,
+        # so each paddle gets its own moves
+        paddle_moves = iter(moves)
+
+        def replay(paddle):
+            return PaddleMovementManager_Replay(paddle, next(paddle_moves))
+
+        self.game = setup_game(
+            True,
+            replay,
+            replay,
+            balls=header["balls"],
+            paddles_per_side=header["paddles_per_side"],
+            size=header["size"],
+            ball_speed=header["ball_speed"],
+            ball_maxspeed=header["ball_maxspeed"],
+            paddle_speed=header["paddle_speed"],
+            paddle_width=header["paddle_width"],
+            paddle_height=header["paddle_height"],
+            seed=header["seed"],
+            tick_rate=header["tick_rate"],
+        )
+        self.ball = self.game.spritegroups["ballsprite"].sprites()[0]
+        self.snapshots = {0: self.game.snapshot()}
+
+    def play(self, ticks=None):
+        """Simulate forward.
+
+        Args:
+            ticks (int): Number of ticks to play. Defaults to the rest of
+                the replay.
+
+        Returns:
+            State: The state of the game afterwards.
+        """
+        game = self.game
+        end = self.length if ticks is None else min(game.ticks + ticks, self.length)
+        interval = self.snapshot_interval
+        while game.ticks < end:
+            game.step()
+            if game.ticks % interval == 0 and game.ticks not in self.snapshots:
+                self.snapshots[game.ticks] = game.snapshot()
+        return game.state
+
+    def seek(self, tick):
+        """Move playback to just after `tick` ticks have been played.
+
+        Args:
+            tick (int)
+
+        Returns:
+            State: The state of the game at that tick.
+        """
+        tick = max(0, min(tick, self.length))
+        start = max(t for t in self.snapshots if t <= tick)
+        if tick < self.game.ticks or start > self.game.ticks:
+            self.game.restore(self.snapshots[start])
+        return self.play(tick - self.game.ticks)
@@ -0,0 +1,369 @@
+"""
+Authoritative multiplayer server.
+
+Every room runs a headless game, and all rooms are stepped by a single
+tick loop in one asyncio event loop. Clients join a room over TCP, send
+their inputs and receive the state of the room as compact binary deltas.
+
+Every message is a one byte type followed by a fixed size body:
+
+    JOIN     client -> server   room name (16 bytes)
+    WELCOME  server -> client   seat (0 = right paddle, 1 = left), tick rate
+    INPUT    client -> server   sequence number, direction (-1, 0 or 1)
+    STATE    server -> client   tick and every field
+    DELTA    server -> client   tick, bitmask of changed fields, their values
+
+Usage: python server.py [rooms] [seconds]
+    Runs rooms full of scripted clients on localhost and reports how much
+    of a core each room needs.
+"""
+
+import asyncio
+import struct
+import sys
+from time import perf_counter
+from main import setup_game
+from movement_managers import PaddleMovementManager_Network
+
+
+JOIN, WELCOME, INPUT, STATE, DELTA = range(5)
+
+BODIES = {
+    JOIN: struct.Struct("<16s"),
+    WELCOME: struct.Struct("<BH"),
+    INPUT: struct.Struct("<Ib"),
+    STATE: struct.Struct("<I6h"),
+    DELTA: struct.Struct("<IB"),
+}
+FIELD = struct.Struct("<h")
+
+FIELDS = ("ball_x", "ball_y", "paddle1_y", "paddle2_y", "player1_score", "player2_score")
+
+# Clients that fall this far behind on reading are disconnected
+MAX_WRITE_BUFFER = 64 * 1024
+
+
+def encode(type, *values):
+    """Pack a message."""
+    return bytes((type,)) + BODIES[type].pack(*values)
+
+
+def encode_delta(tick, previous, current):
+    """Pack the fields that changed between two states.
+
+    Returns:
+        bytes: The message, or None if nothing changed.
+    """
+    mask = 0
+    values = []
+    for i, (old, new) in enumerate(zip(previous, current)):
+        if old != new:
+            mask |= 1 << i
+            values.append(FIELD.pack(new))
+    if not mask:
+        return None
+    return encode(DELTA, tick, mask) + b"".join(values)
+
+
+async def read_message(reader):
+    """Read one message.
+
+    Returns:
+        (int, tuple): The type of the message and its values. For deltas
+        the values are the tick and a dictionary of the changed fields.
+    """
+    type = (await reader.readexactly(1))[0]
+    body = BODIES[type]
+    values = body.unpack(await reader.readexactly(body.size))
+    if type != DELTA:
+        return type, values
+
+    tick, mask = values
+    changed = {}
+    for i, name in enumerate(FIELDS):
+        if mask & (1 << i):
+            (changed[name],) = FIELD.unpack(await reader.readexactly(FIELD.size))
+    return type, (tick, changed)
+
+
+class Room:
+    """A match hosted by the server.
+
+    Args:
+        name (str)
+        player1 (str): "network" for a remote player, or an AI type.
+        player2 (str): "network" for a remote player, or an AI type.
+        seed (int): Seed of the game's random number generators.
+
+    Attributes:
+        game (Game): The headless game.
+        seats (List[PaddleMovementManager_Network]): The paddles remote
+            players control.
+        clients (List[StreamWriter]): The connected clients.
+        joined (Set[StreamWriter]): Clients that joined since the last
+            broadcast. They are sent the whole state again by the next
+            broadcast, since deltas are computed against the state of the
+            last broadcast, not the one they were sent on joining.
+    """
+
+    def __init__(self, name, player1="network", player2="network", seed=None):
+        self.name = name
+        self.game = setup_game(
+            True,
+            PaddleMovementManager_Network if player1 == "network" else player1,
+            PaddleMovementManager_Network if player2 == "network" else player2,
+            seed=seed,
+        )
+        self.ball = self.game.spritegroups["ballsprite"].sprite
+        self.seats = [
+            manager
+            for manager in self.game.movement_managers
+            if isinstance(manager, PaddleMovementManager_Network)
+        ]
+        self.taken = [False] * len(self.seats)
+        self.clients = []
+        self.joined = set()
+        self.broadcast_state = self.fields()
+
+    @property
+    def full(self):
+        return all(self.taken)
+
+    def join(self, writer):
+        """Seat a client.
+
+        Returns:
+            int: Index of the seat in `seats`, or None if the room is full.
+        """
+        for seat, taken in enumerate(self.taken):
+            if not taken:
+                self.taken[seat] = True
+                self.clients.append(writer)
+                self.joined.add(writer)
+                return seat
+        return None
+
+    def leave(self, writer, seat):
+        """Free the seat of a client that disconnected."""
+        self.taken[seat] = False
+        # The next client to take the seat numbers its inputs from 1 again
+        self.seats[seat].reset()
+        self.joined.discard(writer)
+        if writer in self.clients:
+            self.clients.remove(writer)
+
+    def fields(self):
+        """Return the values of `FIELDS` for the current state."""
+        paddles = [manager.paddle for manager in self.game.movement_managers]
+        return (
+            self.ball.rect.x,
+            self.ball.rect.y,
+            paddles[0].rect.y,
+            paddles[1].rect.y,
+            self.game.state.player1_score,
+            self.game.state.player2_score,
+        )
+
+    def full_state(self):
+        """Pack a message with the whole state, for clients that just joined."""
+        return encode(STATE, self.game.ticks, *self.fields())
+
+    def broadcast(self):
+        """Send what changed since the last broadcast to every client.
+
+        Clients that joined since the last broadcast get the whole state
+        instead.
+        """
+        current = self.fields()
+        message = encode_delta(self.game.ticks, self.broadcast_state, current)
+        self.broadcast_state = current
+        joined = self.joined
+        if message is None and not joined:
+            return
+        if joined:
+            full_state = self.full_state()
+            self.joined = set()
+        for writer in list(self.clients):
+            if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                writer.close()
+                self.clients.remove(writer)
+            elif writer in joined:
+                writer.write(full_state)
+            elif message is not None:
+                writer.write(message)
+
+
+class Server:
+    """Hosts rooms and steps all of them from one tick loop.
+
+    Args:
+        tick_rate (int): Simulation steps per second.
+        broadcast_rate (int): State updates sent to clients per second.
+        player2 (str): Controller of the left paddle in new rooms,
+            "network" for human vs human or an AI type for human vs AI.
+
+    Attributes:
+        rooms (Dict[str, Room])
+        ticks (int): Number of ticks the loop has run.
+        step_time (float): Seconds spent stepping rooms.
+        room_ticks (int): Number of room steps taken.
+    """
+
+    def __init__(self, tick_rate=60, broadcast_rate=20, player2="network"):
+        self.tick_rate = tick_rate
+        self.broadcast_interval = max(1, tick_rate // broadcast_rate)
+        self.player2 = player2
+        self.rooms = {}
+        self.ticks = 0
+        self.step_time = 0
+        self.room_ticks = 0
+        self.running = False
+
+    async def handle_client(self, reader, writer):
+        """Serve one client connection for as long as it lasts."""
+        room = seat = None
+        try:
+            type, (name,) = await read_message(reader)
+            if type != JOIN:
+                return
+            name = name.rstrip(b"\0").decode()
+            room = self.rooms.get(name)
+            if room is None:
+                room = self.rooms[name] = Room(name, "network", self.player2)
+            seat = room.join(writer)
+            if seat is None:
+                return
+            writer.write(encode(WELCOME, seat, self.tick_rate))
+            writer.write(room.full_state())
+
+            manager = room.seats[seat]
+            while True:
+                type, values = await read_message(reader)
+                if type == INPUT:
+                    manager.receive(*values)
+        except (asyncio.IncompleteReadError, ConnectionError, KeyError):
+            pass
+        finally:
+            if seat is not None:
+                room.leave(writer, seat)
+                if not room.clients:
+                    self.rooms.pop(room.name, None)
+            writer.close()
+
+    def tick(self):
+        """Step every full room once and broadcast if it is time to."""
+        start = perf_counter()
+        broadcast = self.ticks % self.broadcast_interval == 0
+        for room in list(self.rooms.values()):
+            if room.full:
+                room.game.step()
+                self.room_ticks += 1
+                if broadcast:
+                    room.broadcast()
+        self.ticks += 1
+        self.step_time += perf_counter() - start
+
+    async def tick_loop(self):
+        """Call `tick` tick_rate times per second until `stop` is called."""
+        loop = asyncio.get_running_loop()
+        tick_length = 1 / self.tick_rate
+        next_tick = loop.time()
+        self.running = True
+        while self.running:
+            self.tick()
+            next_tick += tick_length
+            delay = next_tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Behind schedule; let the clients be served before catching up
+                await asyncio.sleep(0)
+
+    def stop(self):
+        self.running = False
+
+    async def serve(self, host="127.0.0.1", port=0):
+        """Start listening and run the tick loop.
+
+        Returns:
+            (AbstractServer, Task): The listening server and the tick loop.
+        """
+        server = await asyncio.start_server(self.handle_client, host, port)
+        return server, asyncio.create_task(self.tick_loop())
+
+
+class ScriptedClient:
+    """A stand-in client that plays by a script, for testing over localhost.
+
+    Args:
+        room (str): The room to join.
+        script (Callable[[dict, int], int]): Given the last known state and
+            the client's seat, returns the direction to move in. Defaults to
+            following the ball.
+
+    Attributes:
+        seat (int)
+        state (dict): The fields of the last state received.
+        updates (int): Number of state messages received.
+    """
+
+    def __init__(self, room, script=None):
+        self.room = room
+        self.script = script if script is not None else ScriptedClient.follow_ball
+        self.seat = None
+        self.state = {}
+        self.updates = 0
+
+    @staticmethod
+    def follow_ball(state, seat):
+        paddle_y = state["paddle1_y" if seat == 0 else "paddle2_y"] + 50
+        ball_y = state["ball_y"] + 8
+        return (ball_y > paddle_y) - (ball_y < paddle_y)
+
+    async def run(self, host, port, seconds):
+        """Play for `seconds`, sending an input after every update."""
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(encode(JOIN, self.room.encode()))
+        sequence = 0
+        try:
+            async with asyncio.timeout(seconds):
+                while True:
+                    type, values = await read_message(reader)
+                    if type == WELCOME:
+                        self.seat = values[0]
+                        continue
+                    if type == STATE:
+                        self.state = dict(zip(FIELDS, values[1:]))
+                    elif type == DELTA:
+                        self.state.update(values[1])
+                    self.updates += 1
+                    sequence += 1
+                    direction = self.script(self.state, self.seat)
+                    writer.write(encode(INPUT, sequence, direction))
+        except (TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def demo(rooms, seconds):
+    server = Server()
+    listener, tick_loop = await server.serve()
+    host, port = listener.sockets[0].getsockname()[:2]
+    clients = [ScriptedClient(f"room{i}") for i in range(rooms) for _ in range(2)]
+    await asyncio.gather(*(client.run(host, port, seconds) for client in clients))
+    server.stop()
+    await tick_loop
+    listener.close()
+
+    per_room_tick = server.step_time / max(server.room_ticks, 1)
+    print(f"{rooms} rooms, {server.ticks} ticks, {server.room_ticks} room steps")
+    print(f"{per_room_tick * 1e6:.1f} us per room step")
+    print(f"~{1 / (per_room_tick * server.tick_rate):.0f} rooms per core at {server.tick_rate} Hz")
+    print(f"{sum(client.updates for client in clients)} updates received")
+
+
+if __name__ == "__main__":
+    rooms = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    asyncio.run(demo(rooms, seconds))
@@ -0,0 +1,137 @@
+"""
+Snapshots of the state of a simulation.
+
+A snapshot holds everything that changes while a match is simulated: the
+tick and scores, the random number generator of the physics, the
+position and motion of every ball and paddle and the state of every
+movement manager. It is made of tuples and numbers only, so it is
+immutable, cheap to take every tick and can be pickled. Surfaces,
+sprite groups and other things that don't change while playing are not
+part of it, so a snapshot can only be restored into the game it was
+taken from (or one set up identically, with the same controllers).
+
+Snapshots make it possible to rewind a match, e.g. for rollback
+netcode, to branch off simulations to look ahead, and to checkpoint
+long headless matches.
+
+Copying the state of a random number generator is what makes up most
+of the cost of a snapshot, so the game's streams are `Random`s, which
+only copy it again after numbers were drawn.
+"""
+
+import random
+from collections import namedtuple
+
+
+Snapshot = namedtuple(
+    "Snapshot", "ticks player1_score player2_score rng_state balls paddles managers"
+)
+BallState = namedtuple("BallState", "x y angle speed hits trajectory velocity")
+PaddleState = namedtuple("PaddleState", "x y movepos")
+
+
+class Random(random.Random):
+    """A random number generator whose state is cheap to get repeatedly.
+
+    The state returned by `getstate` is kept until a number is drawn or
+    the generator is seeded, so taking it on every tick only copies it
+    when it changed.
+    """
+
+    def seed(self, *args, **kwargs):
+        self._state = None
+        super().seed(*args, **kwargs)
+
+    def random(self):
+        self._state = None
+        return super().random()
+
+    def getrandbits(self, k):
+        self._state = None
+        return super().getrandbits(k)
+
+    def getstate(self):
+        state = self._state
+        if state is None:
+            state = self._state = super().getstate()
+        return state
+
+    def setstate(self, state):
+        if state is not self._state:
+            super().setstate(state)
+            self._state = state
+
+
+def take(game):
+    """Take a snapshot of the state of a game.
+
+    Args:
+        game (Game)
+
+    Returns:
+        Snapshot
+    """
+    state = game.state
+    return Snapshot(
+        game.ticks,
+        state.player1_score,
+        state.player2_score,
+        game.rng.getstate(),
+        tuple(
+            BallState(
+                ball.body.x,
+                ball.body.y,
+                ball.angle,
+                ball.speed,
+                ball.hits,
+                ball.trajectory,
+                ball.velocity,
+            )
+            for ball in game.spritegroups["ballsprite"]
+        ),
+        tuple(
+            PaddleState(paddle.body.x, paddle.body.y, tuple(paddle.movepos))
+            for paddle in game.spritegroups["paddlesprites"]
+        ),
+        tuple(manager.snapshot() for manager in game.movement_managers),
+    )
+
+
+def restore(game, snapshot):
+    """Put a game back in the state of a snapshot.
+
+    Args:
+        game (Game): The game the snapshot was taken from.
+        snapshot (Snapshot)
+    """
+    state = game.state
+    game.ticks = snapshot.ticks
+    state.player1_score = snapshot.player1_score
+    state.player2_score = snapshot.player2_score
+    state.revision += 1
+    game.rng.setstate(snapshot.rng_state)
+
+    for ball, ball_state in zip(game.spritegroups["ballsprite"], snapshot.balls):
+        ball.body.x = ball_state.x
+        ball.body.y = ball_state.y
+        ball.angle = ball_state.angle
+        ball.speed = ball_state.speed
+        ball.hits = ball_state.hits
+        # The same trajectory tuple is put back, so anything cached for
+        # it by identity stays valid
+        ball.trajectory = ball_state.trajectory
+        ball.velocity = ball_state.velocity
+        if ball.grid is not None:
+            ball.grid.move(ball)
+
+    for paddle, paddle_state in zip(
+        game.spritegroups["paddlesprites"], snapshot.paddles
+    ):
+        paddle.body.x = paddle_state.x
+        paddle.body.y = paddle_state.y
+        paddle.movepos = list(paddle_state.movepos)
+        if paddle.grid is not None:
+            paddle.grid.move(paddle)
+
+    for manager, manager_state in zip(game.movement_managers, snapshot.managers):
+        manager.restore(manager_state)
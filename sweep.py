@@ -0,0 +1,293 @@
+"""
+Parameter sweeps for tuning the difficulty of the game.
+
+Every combination of the given parameter values is a point of the sweep,
+and at every point a number of seeded headless matches is played across
+a process pool. Results are appended to a CSV file with one column per
+parameter and result as each match finishes, so an interrupted sweep
+can be resumed by running the same command again: matches already in
+the file are skipped. Matches are identified by their controllers,
+parameters and number, and seeded from them, so the grid can also be
+extended later without replaying the points it already had.
+
+Usage: python sweep.py OUTPUT.csv [--ball-speed 4,5,6] [--paddle-height 60,100] ...
+"""
+
+import argparse
+import csv
+import itertools
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from tournament import play_match
+
+
+# The parameters of a point and their default values, which also set
+# their types
+PARAMETERS = {
+    "ball_speed": 5.0,
+    "ball_maxspeed": 15.0,
+    "paddle_width": 16,
+    "paddle_height": 100,
+    "paddle_speed": 5.0,
+    "width": 640,
+    "height": 480,
+}
+RESULTS = ("player1_score", "player2_score", "ticks", "hits", "elapsed")
+COLUMNS = ("player1", "player2") + tuple(PARAMETERS) + ("match", "seed") + RESULTS
+
+
+def points(values):
+    """List every combination of parameter values.
+
+    Args:
+        values (Dict[str, List]): Values to try for each parameter.
+            Parameters that aren't given keep their default value.
+
+    Returns:
+        List[dict]: Every point, with a value for each of `PARAMETERS`.
+
+    Raises:
+        ValueError: If a parameter is not one of `PARAMETERS`.
+    """
+    for name in values:
+        if name not in PARAMETERS:
+            raise ValueError(f"unknown parameter {name!r}")
+    names = list(PARAMETERS)
+    choices = []
+    for name in names:
+        default = PARAMETERS[name]
+        choices.append([type(default)(value) for value in values.get(name, [default])])
+    return [dict(zip(names, choice)) for choice in itertools.product(*choices)]
+
+
+def point_key(player1, player2, point):
+    """Identify a point by its controllers and parameters, as written to the file."""
+    return (player1, player2) + tuple(str(point[name]) for name in PARAMETERS)
+
+
+def match_seed(seed, key, match):
+    """Derive the seed of a match, independent of the rest of the sweep."""
+    return random.Random(f"{seed}:{':'.join(key)}:{match}").getrandbits(32)
+
+
+def play_point_match(args):
+    """Play one match of a sweep and return its row for the output file."""
+    player1, player2, point, match, seed, max_score, max_ticks = args
+    result = play_match(
+        (player1, player1),
+        (player2, player2),
+        seed,
+        max_score=max_score,
+        max_ticks=max_ticks,
+        size=(point["width"], point["height"]),
+        ball_speed=point["ball_speed"],
+        ball_maxspeed=point["ball_maxspeed"],
+        paddle_speed=point["paddle_speed"],
+        paddle_width=point["paddle_width"],
+        paddle_height=point["paddle_height"],
+    )
+    row = {"player1": player1, "player2": player2, "match": match, "seed": seed}
+    row.update(point)
+    for name in RESULTS:
+        row[name] = getattr(result, name)
+    return row
+
+
+def read_rows(path):
+    """Read the complete rows of an output file.
+
+    A row cut short by an interrupted sweep is removed from the file, so
+    appending continues on a fresh line.
+
+    Returns:
+        List[dict]: The rows, with their values as strings.
+
+    Raises:
+        ValueError: If the file has different columns than a sweep writes.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb+") as file:
+        data = file.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            file.truncate(end)
+    with open(path, newline="") as file:
+        reader = csv.DictReader(file)
+        if reader.fieldnames is not None and tuple(reader.fieldnames) != COLUMNS:
+            raise ValueError(f"{path} was not written by this version of the sweep")
+        return list(reader)
+
+
+def run_sweep(
+    path,
+    values,
+    matches=10,
+    seed=0,
+    player1="basic",
+    player2="advanced",
+    max_score=5,
+    max_ticks=60 * 60 * 60,
+    max_workers=None,
+):
+    """Play every match of a sweep that isn't in the output file yet.
+
+    Args:
+        path (str): The CSV file results are appended to.
+        values (Dict[str, List]): Values to try for each parameter, see
+            `points`.
+        matches (int): Number of matches played at every point.
+        seed (int): Seed from which the seed of every match is derived.
+        player1 (str): Controller of the right paddle.
+        player2 (str): Controller of the left paddle.
+        max_score (int): Score that wins a match.
+        max_ticks (int): Number of ticks after which a match is stopped.
+        max_workers (int): Number of worker processes. Defaults to the
+            number of CPUs.
+
+    Returns:
+        int: Number of matches played.
+    """
+    done = {
+        (point_key(row["player1"], row["player2"], row), int(row["match"]))
+        for row in read_rows(path)
+    }
+    todo = []
+    for point in points(values):
+        key = point_key(player1, player2, point)
+        for match in range(matches):
+            if (key, match) not in done:
+                todo.append(
+                    (
+                        player1,
+                        player2,
+                        point,
+                        match,
+                        match_seed(seed, key, match),
+                        max_score,
+                        max_ticks,
+                    )
+                )
+    if not todo:
+        return 0
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline="") as file:
+        writer = csv.DictWriter(file, COLUMNS)
+        if new_file:
+            writer.writeheader()
+        chunksize = max(1, min(16, len(todo) // (4 * max_workers)))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # Rows are written as they come in, so little is lost on an interruption
+            for row in executor.map(play_point_match, todo, chunksize=chunksize):
+                writer.writerow(row)
+                file.flush()
+    return len(todo)
+
+
+def summarize(path):
+    """Summarize a sweep per point.
+
+    Returns:
+        List[dict]: For each point, in the order they appear in the file,
+        its controllers and parameters, number of matches, player 1 win
+        rate and average rally length (paddle hits per point scored).
+    """
+    table = {}
+    for row in read_rows(path):
+        key = point_key(row["player1"], row["player2"], row)
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = {"player1": row["player1"], "player2": row["player2"]}
+            for name, default in PARAMETERS.items():
+                entry[name] = type(default)(row[name])
+            entry.update(matches=0, wins=0, points=0, hits=0)
+        player1_score = int(row["player1_score"])
+        player2_score = int(row["player2_score"])
+        entry["matches"] += 1
+        entry["wins"] += player1_score > player2_score
+        entry["points"] += player1_score + player2_score
+        entry["hits"] += int(row["hits"])
+
+    for entry in table.values():
+        entry["win_rate"] = entry.pop("wins") / entry["matches"]
+        entry["average_rally_length"] = entry.pop("hits") / max(entry.pop("points"), 1)
+    return list(table.values())
+
+
+def parse_values(type):
+    def parse(text):
+        try:
+            return [type(value) for value in text.split(",")]
+        except ValueError:
+            raise argparse.ArgumentTypeError(
+                f"{text!r} is not a list of {type.__name__}"
+            )
+
+    return parse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("output", help="CSV file to append results to")
+    for name, default in PARAMETERS.items():
+        parser.add_argument(
+            "--" + name.replace("_", "-"),
+            type=parse_values(type(default)),
+            help=f"comma separated values (default {default})",
+        )
+    parser.add_argument("--matches", type=int, default=10, help="matches per point")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--player1", default="basic")
+    parser.add_argument("--player2", default="advanced")
+    parser.add_argument("--max-score", type=int, default=5)
+    parser.add_argument("--max-ticks", type=int, default=60 * 60 * 60)
+    parser.add_argument("--workers", type=int, help="worker processes")
+    args = parser.parse_args()
+
+    values = {
+        name: getattr(args, name)
+        for name in PARAMETERS
+        if getattr(args, name) is not None
+    }
+    start = time.perf_counter()
+    try:
+        played = run_sweep(
+            args.output,
+            values,
+            matches=args.matches,
+            seed=args.seed,
+            player1=args.player1,
+            player2=args.player2,
+            max_score=args.max_score,
+            max_ticks=args.max_ticks,
+            max_workers=args.workers,
+        )
+    except ValueError as error:
+        sys.exit(str(error))
+    elapsed = time.perf_counter() - start
+
+    names = list(PARAMETERS)
+    print(
+        f"{'players':<20}"
+        + " ".join(f"{name:>13}" for name in names)
+        + f"{'matches':>8}{'p1 wins':>9}{'rally':>8}"
+    )
+    for entry in summarize(args.output):
+        players = f"{entry['player1']} vs {entry['player2']}"
+        print(
+            f"{players:<20}"
+            + " ".join(f"{entry[name]:>13}" for name in names)
+            + f"{entry['matches']:>8}{entry['win_rate']:>9.2%}"
+            f"{entry['average_rally_length']:>8.2f}"
+        )
+    print(f"{played} matches played in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
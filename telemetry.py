@@ -0,0 +1,276 @@
+"""
+Streaming match telemetry.
+
+Every sampled tick of a match becomes a `Sample` with the position and
+speed of every ball, the position of every paddle, the number of hits
+and the scores. Samples are either pulled from the `stream` generator,
+which runs a headless match, or pushed to sinks by a `Telemetry` added
+to a game as a listener:
+
+    telemetry = Telemetry([RollingAggregator(), JSONLinesWriter("match.jsonl")])
+    game.add_listeners([telemetry])
+
+Only every `every`th tick is sampled, plus every tick on which a player
+scored, so goals are never missed. Nothing grows with the length of a
+match: aggregators keep a fixed size ring buffer of recent samples,
+files are written in chunks and rotated, and samples a socket can't take
+right away are dropped, so a match can run headless for days.
+"""
+
+import json
+import os
+import socket
+from collections import deque, namedtuple
+
+
+Sample = namedtuple(
+    "Sample", "tick balls paddles hits player1_score player2_score scored"
+)
+Sample.__doc__ = """The state of a match after a tick.
+
+Attributes:
+    tick (int)
+    balls (Tuple[(float, float, float)]): The x and y of the center and
+        the speed of every ball.
+    paddles (Tuple[float]): The y of the center of every paddle.
+    hits (int): Number of times a paddle has hit a ball in total.
+    player1_score (int)
+    player2_score (int)
+    scored (Tuple[int]): The players (1 or 2) who scored on this tick.
+"""
+
+
+def encode(sample):
+    """Encode a sample as a line of JSON, including the newline."""
+    return json.dumps(sample._asdict(), separators=(",", ":")) + "\n"
+
+
+class Telemetry:
+    """Samples a game after every step and sends the samples to sinks.
+
+    Args:
+        sinks (List[Callable[[Sample], None]]): Where samples go. Sinks
+            with a `close` method are closed with the telemetry.
+        every (int): Sample every this many ticks. Ticks on which a
+            player scored are always sampled.
+
+    Attributes:
+        samples (int): Number of samples taken.
+    """
+
+    def __init__(self, sinks=(), every=1):
+        self.sinks = list(sinks)
+        self.every = every
+        self.samples = 0
+        self._revision = None
+        self._scores = (0, 0)
+
+    def sample(self, game):
+        """Sample the game if the current tick is due.
+
+        Returns:
+            Sample: The sample, or None if the tick isn't sampled.
+        """
+        state = game.state
+        scored = ()
+        if state.revision != self._revision:
+            self._revision = state.revision
+            player1_score, player2_score = self._scores
+            self._scores = (state.player1_score, state.player2_score)
+            if state.player1_score > player1_score:
+                scored += (1,)
+            if state.player2_score > player2_score:
+                scored += (2,)
+        if not scored and game.ticks % self.every:
+            return None
+
+        # List comprehensions over sprites() are the cheapest way through
+        # the groups, which matters when sampling every tick
+        balls = game.spritegroups["ballsprite"].sprites()
+        paddles = game.spritegroups["paddlesprites"].sprites()
+        self.samples += 1
+        return Sample(
+            game.ticks,
+            tuple([(ball.body.centerx, ball.body.centery, ball.speed) for ball in balls]),
+            tuple([paddle.body.centery for paddle in paddles]),
+            sum([ball.hits for ball in balls]),
+            state.player1_score,
+            state.player2_score,
+            scored,
+        )
+
+    def __call__(self, game):
+        """Sample the game and send the sample to every sink."""
+        sample = self.sample(game)
+        if sample is not None:
+            for sink in self.sinks:
+                sink(sample)
+
+    def close(self):
+        """Close every sink that can be closed."""
+        for sink in self.sinks:
+            close = getattr(sink, "close", None)
+            if close is not None:
+                close()
+
+
+def stream(game, every=1, max_score=None, max_ticks=None):
+    """Run a headless match and yield its samples as it is played.
+
+    The match only advances as samples are consumed.
+
+    Args:
+        game (Game)
+        every (int): See `Telemetry`.
+        max_score (int): Stop once either player reaches this score.
+        max_ticks (int): Stop after this many simulation steps.
+
+    Yields:
+        Sample
+    """
+    telemetry = Telemetry(every=every)
+    while not game.finished(max_score, max_ticks):
+        game.step()
+        sample = telemetry.sample(game)
+        if sample is not None:
+            yield sample
+
+
+class RollingAggregator:
+    """Keeps statistics over the most recent samples and the whole match.
+
+    Samples are only appended to a ring buffer as they come in, and the
+    statistics are computed when asked for, so taking a sample costs the
+    same however large the window is.
+
+    Args:
+        window (int): Number of recent samples kept.
+        tick_rate (int): Simulation steps per second, to turn ticks into
+            time.
+
+    Attributes:
+        recent (deque): The most recent samples.
+        samples (int): Number of samples received.
+        goals (List[int]): Goals scored by player 1 and player 2.
+    """
+
+    def __init__(self, window=3600, tick_rate=60):
+        self.recent = deque(maxlen=window)
+        self.tick_rate = tick_rate
+        self.samples = 0
+        self.goals = [0, 0]
+
+    def __call__(self, sample):
+        self.recent.append(sample)
+        self.samples += 1
+        for player in sample.scored:
+            self.goals[player - 1] += 1
+
+    def summary(self):
+        """Summarize the window and the match so far.
+
+        Returns:
+            dict: The number of samples and goals of the whole match, the
+            seconds of game time the window covers, and over the window
+            the average and maximum ball speed, paddle hits per minute and
+            goals scored.
+        """
+        recent = self.recent
+        summary = {"samples": self.samples, "goals": list(self.goals)}
+        if not recent:
+            return summary
+        speeds = [ball[2] for sample in recent for ball in sample.balls]
+        first, last = recent[0], recent[-1]
+        seconds = (last.tick - first.tick) / self.tick_rate
+        summary.update(
+            window_seconds=seconds,
+            ball_speed_mean=sum(speeds) / len(speeds) if speeds else 0,
+            ball_speed_max=max(speeds, default=0),
+            hits_per_minute=(last.hits - first.hits) / seconds * 60 if seconds else 0,
+            window_goals=sum(len(sample.scored) for sample in recent),
+        )
+        return summary
+
+
+class JSONLinesWriter:
+    """Writes samples to a file, one JSON object per line.
+
+    Lines are buffered and written in chunks. Once the file reaches
+    `max_bytes` it is renamed to the same path plus ".1", replacing the
+    previous one, and a new file is started, so at most twice that is kept
+    on disk.
+
+    Args:
+        path (str)
+        flush_size (int): Number of buffered characters that triggers a write.
+        max_bytes (int): Size at which the file is rotated, or None to
+            never rotate.
+    """
+
+    def __init__(self, path, flush_size=65536, max_bytes=None):
+        self.path = path
+        self.flush_size = flush_size
+        self.max_bytes = max_bytes
+        self.file = open(path, "w")
+        self.size = 0
+        self.buffer = []
+        self.buffered = 0
+
+    def __call__(self, sample):
+        line = encode(sample)
+        self.buffer.append(line)
+        self.buffered += len(line)
+        if self.buffered >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered lines to disk."""
+        if self.max_bytes is not None and self.size + self.buffered > self.max_bytes:
+            self.file.close()
+            os.replace(self.path, self.path + ".1")
+            self.file = open(self.path, "w")
+            self.size = 0
+        self.file.write("".join(self.buffer))
+        self.file.flush()
+        self.size += self.buffered
+        self.buffer.clear()
+        self.buffered = 0
+
+    def close(self):
+        """Write what is left and close the file."""
+        self.flush()
+        self.file.close()
+
+
+class SocketSink:
+    """Sends samples as JSON datagrams to a local socket.
+
+    Sending never blocks the game: when nobody is listening or the
+    receiver falls behind, samples are dropped.
+
+    Args:
+        address (str or (str, int)): The path of a Unix datagram socket,
+            or a host and port to send UDP to.
+
+    Attributes:
+        sent (int): Number of samples sent.
+        dropped (int): Number of samples that couldn't be sent.
+    """
+
+    def __init__(self, address):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.address = address
+        self.socket = socket.socket(family, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.sent = 0
+        self.dropped = 0
+
+    def __call__(self, sample):
+        try:
+            self.socket.sendto(encode(sample).encode(), self.address)
+            self.sent += 1
+        except OSError:
+            self.dropped += 1
+
+    def close(self):
+        self.socket.close()
@@ -0,0 +1,90 @@
+"""
+Checks that `BatchPhysics` plays matches exactly as headless games do.
+
+Usage: python -m pytest test_batch.py
+"""
+
+import numpy as np
+import pytest
+from batch import BatchPhysics
+from main import setup_game
+from movement_managers import PaddleMovementManager_Action
+
+
+def play_along(games, batch, ticks, left_still=False):
+    """Step the games and the batch side by side and compare them after every tick.
+
+    The batch's launch angles are copied from the games, since they draw
+    them from different random number generators.
+    """
+    balls = [game.spritegroups["ballsprite"].sprite for game in games]
+    paddles = [
+        [manager.paddle for manager in game.movement_managers] for game in games
+    ]
+    everything = np.ones(batch.n, dtype=bool)
+    batch.angle[:] = [ball.angle for ball in balls]
+    batch.new_trajectory(everything)
+
+    for tick in range(ticks):
+        right_moves = batch.basic_moves(batch.right_y)
+        left_moves = 0 if left_still else batch.basic_moves(batch.left_y)
+        for game in games:
+            game.step()
+        batch.step(right_moves, left_moves)
+
+        scored = batch.player1_scored | batch.player2_scored
+        batch.angle[scored] = [ball.angle for ball, goal in zip(balls, scored) if goal]
+        batch.new_trajectory(scored)
+
+        expected = [
+            (
+                ball.body.x,
+                ball.body.y,
+                ball.speed,
+                ball.hits,
+                right.body.y,
+                left.body.y,
+                game.state.player1_score,
+                game.state.player2_score,
+            )
+            for game, ball, (right, left) in zip(games, balls, paddles)
+        ]
+        actual = list(
+            zip(
+                batch.ball_x,
+                batch.ball_y,
+                batch.speed,
+                batch.hits,
+                batch.right_y,
+                batch.left_y,
+                batch.player1_score,
+                batch.player2_score,
+            )
+        )
+        assert actual == expected, f"diverged on tick {tick}"
+
+
+@pytest.mark.parametrize("maxspeed", [15, 40])
+def test_basic_ai_on_both_sides(maxspeed):
+    # At 40 the ball moves further per tick than a paddle is wide
+    game = setup_game(True, "basic", "basic", seed=0, ball_maxspeed=maxspeed)
+    batch = BatchPhysics(1, game.area.size, 5, maxspeed)
+    play_along([game], batch, 20000)
+    assert batch.hits[0] > 100
+
+
+def test_many_matches_with_goals():
+    games = [
+        setup_game(
+            True,
+            "basic",
+            PaddleMovementManager_Action,
+            seed=seed,
+            ball_maxspeed=40,
+            paddle_speed=3,
+        )
+        for seed in range(4)
+    ]
+    batch = BatchPhysics(4, games[0].area.size, 5, 40, paddle_speed=3)
+    play_along(games, batch, 5000, left_still=True)
+    assert (batch.player1_score > 0).all()
@@ -0,0 +1,51 @@
+"""
+Checks that replays play back the matches they recorded.
+
+Usage: python -m pytest test_replay.py
+"""
+
+import pytest
+from main import setup_game
+from replay import ReplayPlayer, ReplayRecorder
+
+
+def positions(game):
+    """Return the scores and the position of every ball and paddle."""
+    bodies = [sprite.body for group in game.spritegroups.values() for sprite in group]
+    return (
+        game.state.player1_score,
+        game.state.player2_score,
+        [(body.x, body.y) for body in bodies],
+    )
+
+
+# Speeds that aren't a whole number of subpixels are rounded down to one
+# by the paddles, so the recorded moves are exact
+@pytest.mark.parametrize("paddle_speed", [5, 2.7, 3.3])
+def test_playback_matches_recording(tmp_path, paddle_speed):
+    path = tmp_path / "match.pongreplay"
+    game = setup_game(True, "advanced", "basic", seed=1, paddle_speed=paddle_speed)
+    recorder = ReplayRecorder(game, path)
+    game.run_headless(max_ticks=5000)
+    recorder.close()
+
+    player = ReplayPlayer(path)
+    player.play()
+    assert player.game.ticks == 5000
+    assert positions(player.game) == positions(game)
+
+
+def test_seek_matches_playing_through(tmp_path):
+    path = tmp_path / "match.pongreplay"
+    game = setup_game(True, "advanced", "basic", seed=2, paddle_speed=2.7)
+    recorder = ReplayRecorder(game, path)
+    game.run_headless(max_ticks=3000)
+    recorder.close()
+
+    player = ReplayPlayer(path, snapshot_interval=500)
+    player.play()
+    player.seek(1234)
+    seeked = positions(player.game)
+    player = ReplayPlayer(path)
+    player.play(1234)
+    assert seeked == positions(player.game)
@@ -0,0 +1,71 @@
+import pygame
+from collections import OrderedDict
+
+
+class TextCache:
+    """A cache of rendered text surfaces with least recently used eviction.
+
+    Rendering text rasterizes every glyph, which is far too slow to do
+    every frame for text that rarely changes. Surfaces are cached by
+    (font, text, color, antialias) and the least recently used one is
+    dropped once the cache holds `maxsize` surfaces.
+
+    Args:
+        maxsize (int): The maximum number of surfaces kept.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._surfaces = OrderedDict()
+        self._fonts = {}
+
+    def font(self, name, size):
+        """Return a shared Font, so equal fonts map to the same cache entries.
+
+        Args:
+            name (str): A font file, or None for the default font.
+            size (int)
+
+        Returns:
+            Font
+        """
+        key = (name, size)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._fonts[key] = pygame.font.Font(name, size)
+        return font
+
+    def render(self, font, text, color, antialias=True):
+        """Return `text` rendered with `font`, rendering it only if it isn't cached.
+
+        The returned surface is shared, so it must not be drawn on. Once
+        a display mode is set it is converted to the display's format.
+
+        Args:
+            font (Font)
+            text (str)
+            color (Color or (int, int, int))
+            antialias (bool)
+
+        Returns:
+            Surface
+        """
+        key = (font, text, tuple(color), antialias)
+        surface = self._surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, antialias, color)
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert_alpha()
+            self._surfaces[key] = surface
+            if len(self._surfaces) > self.maxsize:
+                self._surfaces.popitem(last=False)
+        else:
+            self._surfaces.move_to_end(key)
+        return surface
+
+    def clear(self):
+        """Drop every cached surface."""
+        self._surfaces.clear()
+
+
+text_cache = TextCache()
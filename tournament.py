@@ -0,0 +1,186 @@
+"""
+Round-robin tournaments between paddle controllers.
+
+Every match is played headlessly in a worker process and seeded from the
+tournament seed, so the same tournament always produces the same results.
+
+Usage: python tournament.py [games_per_pairing] [seed]
+"""
+
+import os
+import random
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import permutations
+import controllers
+from main import setup_game
+
+
+# The controllers that take part in a tournament by default
+CONTROLLERS = ["basic", "advanced", "search"]
+
+MatchResult = namedtuple(
+    "MatchResult",
+    "player1 player2 seed player1_score player2_score ticks hits elapsed",
+)
+
+
+def register_controller(name, controller):
+    """Make a controller available to tournaments.
+
+    Custom `PaddleMovementManager` subclasses (or a `functools.partial` of
+    one, e.g. a `PaddleMovementManager_Replay` with its recorded moves
+    under the name "manual-replay") are registered in the `controllers`
+    registry and take part in tournaments by default. They must be
+    picklable, or given as a "module:attribute" path, so they can be
+    sent to the worker processes.
+
+    Args:
+        name (str): The name the controller is listed under.
+        controller (str or Callable[[Paddle], PaddleMovementManager]):
+            Anything accepted by `controllers.register`.
+    """
+    controllers.register(name, controller)
+    if name not in CONTROLLERS:
+        CONTROLLERS.append(name)
+
+
+def play_match(
+    player1, player2, seed, max_score=11, max_ticks=60 * 60 * 60, **kwargs
+):
+    """Play one headless match.
+
+    Args:
+        player1 ((str, controller)): Name and controller of the right paddle.
+        player2 ((str, controller)): Name and controller of the left paddle.
+        seed (int): Seed of the game's random number generators.
+        max_score (int): Score that wins the match.
+        max_ticks (int): Number of ticks after which the match is stopped.
+        **kwargs: Further arguments for `setup_game`, such as the size of
+            the field or the speed of the ball.
+
+    Returns:
+        MatchResult
+    """
+    game = setup_game(True, player1[1], player2[1], seed=seed, **kwargs)
+    start = time.perf_counter()
+    state = game.startloop(max_score=max_score, max_ticks=max_ticks)
+    elapsed = time.perf_counter() - start
+    return MatchResult(
+        player1[0],
+        player2[0],
+        seed,
+        state.player1_score,
+        state.player2_score,
+        game.ticks,
+        sum([ball.hits for ball in game.spritegroups["ballsprite"].sprites()]),
+        elapsed,
+    )
+
+
+def _play_match(args):
+    return play_match(*args)
+
+
+def schedule(names, games_per_pairing, seed):
+    """List the matches of a round robin where everyone plays both sides.
+
+    Returns:
+        List[tuple]: Arguments for `play_match`, one tuple per match.
+    """
+    rng = random.Random(seed)
+    matches = []
+    for name1, name2 in permutations(names, 2):
+        for _ in range(games_per_pairing):
+            matches.append(
+                (
+                    (name1, controllers.REGISTRY.get(name1, name1)),
+                    (name2, controllers.REGISTRY.get(name2, name2)),
+                    rng.getrandbits(32),
+                )
+            )
+    return matches
+
+
+def run_tournament(names=None, games_per_pairing=10, seed=0, max_workers=None):
+    """Play a round robin between controllers across a process pool.
+
+    Args:
+        names (List[str]): Registered controllers taking part. Defaults
+            to `CONTROLLERS`.
+        games_per_pairing (int): Matches each controller plays against
+            each other controller on each side.
+        seed (int): Seed from which the seed of every match is derived.
+        max_workers (int): Number of worker processes. Defaults to the
+            number of CPUs.
+
+    Returns:
+        List[MatchResult]: The results, in schedule order.
+    """
+    if names is None:
+        names = list(CONTROLLERS)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    matches = schedule(names, games_per_pairing, seed)
+    chunksize = max(1, len(matches) // (4 * max_workers))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(_play_match, matches, chunksize=chunksize))
+
+
+def standings(results, tick_rate=60):
+    """Summarize match results per controller.
+
+    Args:
+        results (List[MatchResult])
+        tick_rate (int): Ticks per second of game time.
+
+    Returns:
+        Dict[str, dict]: For each controller its number of matches, win
+        rate, average rally length (paddle hits per point) and points
+        scored per second of game time.
+    """
+    table = {}
+    for result in results:
+        points = result.player1_score + result.player2_score
+        sides = (
+            (result.player1, result.player1_score, result.player2_score),
+            (result.player2, result.player2_score, result.player1_score),
+        )
+        for name, score, opponent_score in sides:
+            entry = table.setdefault(
+                name, {"matches": 0, "wins": 0, "points": 0, "hits": 0, "ticks": 0}
+            )
+            entry["matches"] += 1
+            entry["wins"] += score > opponent_score
+            entry["points"] += points
+            entry["hits"] += result.hits
+            entry["ticks"] += result.ticks
+
+    for entry in table.values():
+        entry["win_rate"] = entry["wins"] / entry["matches"]
+        entry["average_rally_length"] = entry["hits"] / max(entry["points"], 1)
+        entry["points_per_second"] = entry["points"] / max(entry["ticks"], 1) * tick_rate
+    return table
+
+
+def main():
+    games_per_pairing = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    start = time.perf_counter()
+    results = run_tournament(games_per_pairing=games_per_pairing, seed=seed)
+    elapsed = time.perf_counter() - start
+
+    print(f"{'controller':<16}{'matches':>8}{'win rate':>10}{'rally':>8}{'points/s':>10}")
+    for name, entry in sorted(standings(results).items()):
+        print(
+            f"{name:<16}{entry['matches']:>8}{entry['win_rate']:>10.2%}"
+            f"{entry['average_rally_length']:>8.2f}{entry['points_per_second']:>10.3f}"
+        )
+    print(f"{len(results)} matches in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import math
+
+
+class TrajectoryPredictor:
+    """Predicts where the ball will cross a vertical line.
+
+    The ball moves in a straight line between bounces, so the prediction
+    only has to be computed once per segment of its trajectory. `Ball`
+    replaces its `trajectory` tuple whenever it bounces, hits a paddle or
+    is reset, which invalidates everything cached here. While the ball
+    stays on the same segment every query is a dictionary lookup.
+
+    Args:
+        height (int or float): Height of the field the ball bounces in.
+    """
+
+    def __init__(self, height):
+        self.height = height
+        self._margin = 0
+        self._trajectory = None
+        self._heading = None
+        self._slope = 0
+        self._intercepts = {}
+
+    def _refresh(self, ball):
+        trajectory = ball.trajectory
+        if trajectory is self._trajectory:
+            return
+        self._trajectory = trajectory
+        angle = trajectory[2]
+        if angle < 0:
+            angle = 2 * math.pi + angle
+        self._heading = (
+            "left" if angle > 0.5 * math.pi and angle < 1.5 * math.pi else "right"
+        )
+        self._slope = -math.tan(angle)
+        # The ball bounces when its edge reaches a wall, so its center
+        # stays half a ball away from the top and bottom
+        self._margin = ball.body.height / 2
+        self._intercepts.clear()
+
+    def heading(self, ball):
+        """Return "left" or "right", the direction the ball is moving in."""
+        self._refresh(ball)
+        return self._heading
+
+    def intercept_y(self, ball, x):
+        """Return the y at which the ball's center will cross `x`.
+
+        Bounces off the top and bottom of the field are taken into account
+        by folding the straight line back into the band the center of the
+        ball can reach.
+
+        Args:
+            ball (Ball)
+            x (int or float)
+
+        Returns:
+            float
+        """
+        self._refresh(ball)
+        y = self._intercepts.get(x)
+        if y is None:
+            x0, y0 = self._trajectory[0], self._trajectory[1]
+            y = self.fold(y0 + (x - x0) * self._slope)
+            self._intercepts[x] = y
+        return y
+
+    def project(self, x0, y0, angle, x):
+        """Return where a ball's center moving from (x0, y0) at `angle` crosses `x`.
+
+        Bounces are folded in like for the current ball. This doesn't
+        touch the cache, so it can be used to look ahead at trajectories
+        the ball may take after it is hit.
+        """
+        return self.fold(y0 - (x - x0) * math.tan(angle))
+
+    def fold(self, y):
+        """Reflect an unbounded y back into the field like wall bounces do."""
+        margin = self._margin
+        span = self.height - 2 * margin
+        period = 2 * span
+        y = (y - margin) % period
+        if y > span:
+            y = period - y
+        return y + margin